@@ -0,0 +1,161 @@
+import os
+import re
+import math
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each even every few for from further get gets got had has have having
+he her here hers herself him himself his how i if in into is it its itself just let lets like may me might more most
+much must my myself no nor not now of off often on once one only or other our ours ourselves out over own really same
+say says she should so some such than that the their theirs them themselves then there these they this those through
+to too under until up upon us use used uses using very via was we well were what when where which while who whom why
+will with within without would yes yet you your yours yourself yourselves fascinating question explore lets let's
+old new big large small many far long short high low good great best make makes made know tell explain describe
+""".split())
+
+_CODE_BLOCK = re.compile(r"```.*?```", re.DOTALL)
+_INLINE_MARKUP = re.compile(r"[*_`~>#]+")
+_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_LIST_MARKER = re.compile(r"^\s*(?:[-+*]|\d+[.)])\s+", re.MULTILINE)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])|\n+")
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9'\-]*")
+
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("EXTRACTIVE_WORKERS", 2)), thread_name_prefix="extractive")
+
+
+def strip_markdown(text: str) -> str:
+    text = _CODE_BLOCK.sub(" ", text)
+    text = _LINK.sub(r"\1", text)
+    text = _LIST_MARKER.sub("", text)
+    return _INLINE_MARKUP.sub("", text)
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for sentence in _SENTENCE_SPLIT.split(strip_markdown(text)):
+        sentence = " ".join(sentence.split())
+        if len(_WORD.findall(sentence)) >= 5 and not sentence.endswith("?"):
+            sentences.append(sentence)
+    return sentences
+
+
+def tokenize(text: str) -> List[str]:
+    return [word.lower() for word in _WORD.findall(text)]
+
+
+def stem(word: str) -> str:
+    """A deliberately tiny plural folder so that "hole" and "holes" count as one term."""
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def content_words(text: str) -> List[str]:
+    return [stem(word) for word in tokenize(text) if word not in STOPWORDS and len(word) > 2]
+
+
+def tf_idf_vectors(documents: List[List[str]]) -> List[Dict[str, float]]:
+    document_frequency = Counter(word for document in documents for word in set(document))
+    total = len(documents)
+    vectors = []
+    for document in documents:
+        counts = Counter(document)
+        vectors.append({
+            word: (count / len(document)) * (math.log((1 + total) / (1 + document_frequency[word])) + 1)
+            for word, count in counts.items()
+        })
+    return vectors
+
+
+def cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(weight * b.get(word, 0.0) for word, weight in a.items())
+    norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def text_rank(sentences: List[str], damping: float = 0.85, iterations: int = 30) -> List[float]:
+    """Scores sentences with PageRank over their TF-IDF cosine-similarity graph."""
+    vectors = tf_idf_vectors([content_words(sentence) for sentence in sentences])
+    size = len(sentences)
+    weights = [[cosine(vectors[i], vectors[j]) if i != j else 0.0 for j in range(size)] for i in range(size)]
+    out_sums = [sum(row) for row in weights]
+    scores = [1.0 / size] * size
+    for _ in range(iterations):
+        scores = [
+            (1 - damping) / size + damping * sum(
+                weights[j][i] / out_sums[j] * scores[j] for j in range(size) if out_sums[j]
+            )
+            for i in range(size)
+        ]
+    return scores
+
+
+def extract_points(llm_response: str, limit: int = 5) -> List[str]:
+    """Picks the `limit` most central sentences of the response, in their original order."""
+    sentences = list(dict.fromkeys(split_sentences(llm_response)))
+    if len(sentences) <= limit:
+        return sentences
+    scores = text_rank(sentences)
+    top = sorted(sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True)[:limit])
+    return [sentences[i] for i in top]
+
+
+def candidate_phrases(text: str, max_words: int = 4) -> List[List[str]]:
+    """Runs of consecutive content words, split at stopwords and punctuation (RAKE-style)."""
+    phrases = []
+    for fragment in re.split(r"[^\w \t'\-]+", strip_markdown(text)):
+        phrase = []
+        for word in tokenize(fragment):
+            if word in STOPWORDS or len(word) <= 2:
+                if phrase:
+                    phrases.append(phrase[:max_words])
+                phrase = []
+            else:
+                phrase.append(word)
+        if phrase:
+            phrases.append(phrase[:max_words])
+    return phrases
+
+
+def extract_title(prompt: str, llm_response: str, max_length: int = 100) -> str:
+    """
+    Picks the best-scoring keyphrase, weighting words by TF-IDF over the response sentences and boosting
+    query words. Returns an empty string when no phrase qualifies.
+    """
+    sentences = split_sentences(llm_response) or [llm_response]
+    documents = [content_words(sentence) for sentence in sentences]
+    document_frequency = Counter(word for document in documents for word in set(document))
+    term_frequency = Counter(word for document in documents for word in document)
+    query_words = set(content_words(prompt))
+
+    def word_score(word):
+        idf = math.log((1 + len(documents)) / (1 + document_frequency[word])) + 1
+        return (1 + term_frequency[word]) * idf * (2.0 if word in query_words else 1.0)
+
+    best, best_score = [], 0.0
+    for phrase in candidate_phrases(prompt) + candidate_phrases(llm_response):
+        score = sum(word_score(stem(word)) for word in phrase) / len(phrase) ** 0.75
+        if score > best_score:
+            best, best_score = phrase, score
+    if not best:
+        return ""
+    return " ".join(word.capitalize() for word in best)[:max_length]
+
+
+def extract_chat_insights(prompt: str, llm_response: str) -> dict:
+    """The local counterpart of `schemas.ChatInsights`: a chat name, a notes title and up to five points."""
+    title = extract_title(prompt, llm_response)
+    # An empty name leaves the chat unnamed; notes still need a heading.
+    return {"name": title, "title": title or "Untitled", "points": extract_points(llm_response)}
+
+
+async def aextract_chat_insights(prompt: str, llm_response: str) -> dict:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, extract_chat_insights, prompt, llm_response)
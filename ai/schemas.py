@@ -26,4 +26,22 @@ class BulletPoints(BaseModel):
                     "Black holes can form from collapsing massive stars at the end of their life cycle."
                 ]
             }
-        }
\ No newline at end of file
+        }
+
+
+class ChatInsights(BaseModel):
+    name: str = Field("", description="Only when requested: a concise name representing the chat topic, based on the user's query and LLM response, without suffixes or extra phrases. Max length: 100 characters. Otherwise an empty string.")
+    title: str = Field("Untitled", description="A concise title summarizing the key points. It should represent the overall theme of the points.")
+    points: List[str] = Field(default_factory=lambda : [], min_items=0, max_items=5, description="A list of key bullet points extracted from the LLM response. Each point should be concise and relevant.")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "Black Hole Formation",
+                "title": "Black Hole",
+                "points": [
+                    "A black hole is a region of space where gravity is so strong that nothing, not even light, can escape.",
+                    "The event horizon marks the boundary beyond which nothing can return."
+                ]
+            }
+        }
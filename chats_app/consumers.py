@@ -1,11 +1,19 @@
+import os
+import asyncio
+import logging
 from helper.consumers import BaseChatAsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 from chats_app.models import ChatNotes
-from ai import schemas
+from ai import schemas, extractive
 from langchain_groq import ChatGroq
 
+logger = logging.getLogger(__name__)
+
 class ChatConsumer(BaseChatAsyncJsonWebsocketConsumer):
     groups = []
+    insights_backend = os.getenv('CHAT_INSIGHTS_BACKEND', 'extractive')
+    insights_semaphore = asyncio.Semaphore(int(os.getenv('CHAT_INSIGHTS_CONCURRENCY', 4)))
+    background_tasks = set()
 
     async def connect(self):        
         """Establishes WebSocket connection and initializes LLM."""
@@ -17,7 +25,8 @@ class ChatConsumer(BaseChatAsyncJsonWebsocketConsumer):
 
     async def disconnect(self, close_code):
         """Handles WebSocket disconnection."""
-        ...
+        if hasattr(self, 'graph'):
+            self.run_in_background(self.graph.memory.aclose())
 
     async def receive_json(self, content, **kwargs):
         """Handles incoming JSON messages."""
@@ -32,35 +41,64 @@ class ChatConsumer(BaseChatAsyncJsonWebsocketConsumer):
             await self.send_exception("Prompt is empty")
         await self.send_status("Thinking...")
         response = await self.graph.ainvoke(content, selected_mode=mode)
-        await self.change_chat_is_new_flag_if_response_is_first_time(content, response.get('final_response', ''))
-        await self.generate_bullet_points(response.get('final_response', ''))
-        await self.send_llm_response(response)
+        if await self.send_llm_response(response):
+            self.schedule_chat_insights(content, response.get('response', ''))
     
     async def get_structured_response(self, prompt, schema):
         """Generates a structured response using the LLM."""
         structured_llm = self.llm.with_structured_output(schema)
         return await structured_llm.ainvoke(prompt)
     
-    async def get_new_chat_name(self, prompt, llm_response):
-        """Extracts a name for a new chat from the LLM response."""
-        response = await self.get_structured_response(prompt, schemas.ChatNameResponse)
-        return response.model_dump()
+    def run_in_background(self, coroutine):
+        """Runs a coroutine as a task that outlives the current message, keeping a reference until it is done."""
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        task.add_done_callback(self.log_background_failure)
+
+    @staticmethod
+    def log_background_failure(task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background task failed", exc_info=task.exception())
     
-    async def change_chat_is_new_flag_if_response_is_first_time(self, prompt, llm_response):
-        """Marks the chat as new if this is the first response."""
-        if await self.get_current_chat_responses_count() == 0:
-            new_chat_name = await self.get_new_chat_name(prompt, llm_response)
-            new_chat_name = new_chat_name.get('name', '')
-            await self.change_chat_is_new_flag_to_true(new_chat_name)
+    def schedule_chat_insights(self, prompt, llm_response):
+        """Runs chat naming and notes extraction in the background, after the response has been sent."""
+        self.run_in_background(self.update_chat_insights(prompt, llm_response))
     
-    async def generate_bullet_points(self, llm_response):
-        """Generates and stores bullet points from the LLM response."""
-        response = await self.get_structured_response(llm_response, schemas.BulletPoints)
-        bullet_points = response.model_dump()        
-        await self.create_or_update_current_chat_notes(bullet_points)
+    async def update_chat_insights(self, prompt, llm_response):
+        """Names the chat on its first response and appends bullet points to its notes, isolated from the request."""
+        try:
+            async with self.insights_semaphore:
+                needs_name = await self.get_current_chat_responses_count() <= 1
+                insights = await self.generate_chat_insights(prompt, llm_response, needs_name)
+                if needs_name and insights.get('name'):
+                    await self.change_chat_is_new_flag_to_true(insights['name'])
+                    await self.send_chat_renamed(str(self.chat.id), self.chat.name)
+                await self.create_or_update_current_chat_notes(insights)
+                await self.send_notes_updated(str(self.chat.id), insights.get('title', ''), insights.get('points', []))
+        except Exception:
+            logger.exception("Chat insights failed for chat %s", self.chat.id)
+    
+    async def generate_chat_insights(self, prompt, llm_response, needs_name):
+        """Extracts the chat name and bullet points with the configured backend ('extractive' or 'llm')."""
+        if self.insights_backend == 'llm':
+            return await self.generate_llm_chat_insights(prompt, llm_response, needs_name)
+        return await extractive.aextract_chat_insights(prompt, llm_response)
+    
+    async def generate_llm_chat_insights(self, prompt, llm_response, needs_name):
+        """Extracts the chat name (when needed) and bullet points from the response in a single LLM call."""
+        instruction = (
+            "Extract a concise `title` and up to five key bullet `points` from the response below. "
+            + ("Also give the chat a short `name` based on the user's query and the response." if needs_name else "Leave `name` empty.")
+        )
+        response = await self.get_structured_response(
+            f"{instruction}\n\nUser Query:\n{prompt}\n\nResponse:\n{llm_response}",
+            schemas.ChatInsights
+        )
+        return response.model_dump()
     
     @database_sync_to_async
-    def create_or_update_current_chat_notes(self, bullet_points: schemas.BulletPoints):
+    def create_or_update_current_chat_notes(self, bullet_points: dict):
         """Creates or updates chat notes with extracted bullet points."""
         chat_notes, _ = ChatNotes.objects.get_or_create(chat=self.chat)
         old_notes = chat_notes.notes
@@ -85,4 +123,4 @@ class ChatConsumer(BaseChatAsyncJsonWebsocketConsumer):
     @database_sync_to_async
     def get_current_chat_responses_count(self):
         """Returns the number of responses in the current chat."""
-        return len(list(self.chat.llm_responses.all()))
+        return self.chat.llm_responses.count()
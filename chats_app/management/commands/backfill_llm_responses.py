@@ -0,0 +1,73 @@
+import os
+import re
+import json
+from collections import Counter
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from sqlalchemy import create_engine, select
+from chats_app.models import Chat, LLMResponse
+from workflow_graphs.proxion.history import chat_message_history
+
+
+TIMESTAMP_SUFFIX = re.compile(r" \n @[A-Za-z]+, [A-Za-z]+ \d{2}, \d{4} - \d{2}:\d{2} [AP]M$")
+
+
+def message_content(raw: str) -> tuple:
+    message = json.loads(raw)
+    content = message.get('data', {}).get('content', '')
+    return message.get('type'), TIMESTAMP_SUFFIX.sub('', content)
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills LLMResponse rows from the shared chat-history table so that MEMORY_BACKEND=llm_responses "
+        "sees the same conversations. Run fold_memory_tables first for legacy per-user tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database-url', default=os.getenv('MEMORY_DATABASE_URL'), help="Memory database URL (sync driver).")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be created.")
+
+    def handle(self, *args, **options):
+        engine = create_engine(options['database_url'])
+        statement = select(
+            chat_message_history.c.id, chat_message_history.c.session_id, chat_message_history.c.message, chat_message_history.c.created_at
+        ).order_by(chat_message_history.c.session_id, chat_message_history.c.seq)
+
+        sessions = {}
+        with engine.connect() as connection:
+            for row in connection.execute(statement):
+                sessions.setdefault(row.session_id, []).append((row.id, *message_content(row.message), row.created_at))
+
+        created = 0
+        for session_id, messages in sessions.items():
+            chat = Chat.objects.filter(id=session_id).first()
+            if chat is None:
+                continue
+            # Deduplicated by source row, so a prompt the user repeated is backfilled once per time it was asked.
+            # Turns saved by the consumer (or by earlier runs) carry no source row; each of them accounts for one
+            # occurrence of its prompt.
+            existing = set(chat.llm_responses.exclude(source_history_id=None).values_list('source_history_id', flat=True))
+            untracked = Counter(chat.llm_responses.filter(source_history_id=None).values_list('prompt', flat=True))
+            missing = []
+            pairs = zip(messages, messages[1:])
+            for position, ((source_id, first_type, prompt, _), (_, second_type, response, answered_at)) in enumerate(pairs):
+                if first_type != 'human' or second_type != 'ai' or source_id in existing:
+                    continue
+                if untracked[prompt]:
+                    untracked[prompt] -= 1
+                    continue
+                # auto_now_add ignores explicit values, so the original order is restored after the insert.
+                turn = LLMResponse(chat=chat, prompt=prompt, response=response, source_history_id=source_id)
+                missing.append((turn, answered_at + timedelta(microseconds=position)))
+                existing.add(source_id)
+            if missing and not options['dry_run']:
+                LLMResponse.objects.bulk_create([response for response, _ in missing])
+                for response, created_at in missing:
+                    LLMResponse.objects.filter(pk=response.pk).update(created_at=created_at)
+            created += len(missing)
+            if missing:
+                self.stdout.write(f"{session_id}: {len(missing)} missing turns")
+
+        verb = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {created} LLMResponse rows from {len(sessions)} histories."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from workflow_graphs.proxion.knowledge_base import CosmologyKnowledgeBase, knowledge_base, read_corpus
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the offline cosmology knowledge base from a corpus (a .jsonl export with title/text per line, "
+        "or a directory of .md/.txt files). With --update, only passages not indexed yet are embedded and appended."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help="Path to a .jsonl file or a directory of .md/.txt files.")
+        parser.add_argument('--output', default=knowledge_base.directory, help="Index directory (defaults to KNOWLEDGE_BASE_DIR).")
+        parser.add_argument('--update', action='store_true', help="Append to the existing index instead of rebuilding it.")
+        parser.add_argument('--chunk-size', type=int, default=800)
+        parser.add_argument('--chunk-overlap', type=int, default=100)
+
+    def handle(self, *args, **options):
+        target = CosmologyKnowledgeBase(options['output'])
+        added = target.build(
+            read_corpus(options['corpus']),
+            update=options['update'],
+            chunk_size=options['chunk_size'],
+            chunk_overlap=options['chunk_overlap'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Indexed {added} new passages into {target.directory}."))
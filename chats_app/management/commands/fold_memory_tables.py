@@ -0,0 +1,91 @@
+import os
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand
+from sqlalchemy import create_engine, inspect, select, func, Column, DateTime, String, Table, MetaData
+from workflow_graphs.proxion.history import HISTORY_TABLE_NAME, chat_message_history, metadata
+
+
+# Tables already folded, so re-running the command never appends their messages twice.
+folded_tables = Table(
+    "chat_message_history_folds",
+    MetaData(),
+    Column("table_name", String(255), primary_key=True),
+    Column("folded_at", DateTime(timezone=True), nullable=False),
+)
+
+
+class Command(BaseCommand):
+    help = "Folds the per-user LangChain chat-history tables of the memory database into the shared history table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database-url', default=os.getenv('MEMORY_DATABASE_URL'), help="Memory database URL (sync driver).")
+        parser.add_argument('--drop', action='store_true', help="Drop each per-user table after it has been folded.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be folded.")
+
+    def handle(self, *args, **options):
+        engine = create_engine(options['database_url'])
+        metadata.create_all(engine)
+        folded_tables.metadata.create_all(engine)
+        inspector = inspect(engine)
+
+        with engine.connect() as connection:
+            already_folded = set(connection.execute(select(folded_tables.c.table_name)).scalars())
+        legacy_tables = [
+            name for name in inspector.get_table_names()
+            if name != HISTORY_TABLE_NAME and name not in already_folded
+            and {'id', 'session_id', 'message'} <= {column['name'] for column in inspector.get_columns(name)}
+        ]
+        if not legacy_tables:
+            self.stdout.write("No unfolded per-user history tables found.")
+            return
+
+        folded_rows = 0
+        for table_name in legacy_tables:
+            legacy = Table(table_name, MetaData(), autoload_with=engine)
+            # Keep the original message time when the legacy table recorded one; the id order is kept either way.
+            timestamp = legacy.c.created_at if 'created_at' in legacy.c else None
+            columns = [legacy.c.session_id, legacy.c.message] + ([timestamp.label('created_at')] if timestamp is not None else [])
+            with engine.begin() as connection:
+                rows = connection.execute(select(*columns).order_by(legacy.c.id)).all()
+                if options['dry_run']:
+                    self.stdout.write(f"{table_name}: {len(rows)} messages")
+                    continue
+
+                sessions = {}
+                for row in rows:
+                    sessions.setdefault(str(row.session_id), []).append(row)
+
+                new_rows = []
+                folded_at = datetime.now(timezone.utc)
+                for session_id, session_rows in sessions.items():
+                    # Messages written to the shared table since the switch are newer than the legacy
+                    # ones, so the folded messages go before them.
+                    first = connection.execute(
+                        select(func.min(chat_message_history.c.seq)).where(
+                            chat_message_history.c.user_id == table_name,
+                            chat_message_history.c.session_id == session_id,
+                        )
+                    ).scalar()
+                    start = 1 if first is None else first - len(session_rows)
+                    new_rows += [
+                        {
+                            "user_id": table_name,
+                            "session_id": session_id,
+                            "seq": start + offset,
+                            "message": row.message,
+                            "created_at": getattr(row, "created_at", None) or folded_at,
+                        }
+                        for offset, row in enumerate(session_rows)
+                    ]
+
+                if new_rows:
+                    connection.execute(chat_message_history.insert(), new_rows)
+                connection.execute(folded_tables.insert(), [{"table_name": table_name, "folded_at": folded_at}])
+                if options['drop']:
+                    legacy.drop(connection)
+
+            folded_rows += len(rows)
+            self.stdout.write(f"Folded {len(rows)} messages from {table_name}.")
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Folded {folded_rows} messages from {len(legacy_tables)} tables into {HISTORY_TABLE_NAME}."))
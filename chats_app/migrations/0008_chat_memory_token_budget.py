@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats_app', '0007_alter_chat_options_llmresponse_is_thoughted_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='memory_token_budget',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
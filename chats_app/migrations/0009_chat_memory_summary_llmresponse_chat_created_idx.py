@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats_app', '0008_chat_memory_token_budget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='memory_summary',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='llmresponse',
+            index=models.Index(fields=['chat', 'created_at'], name='llmresponse_chat_created_idx'),
+        ),
+    ]
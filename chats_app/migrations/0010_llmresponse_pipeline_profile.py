@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats_app', '0009_chat_memory_summary_llmresponse_chat_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmresponse',
+            name='pipeline_profile',
+            field=models.CharField(blank=True, choices=[('fast', 'Fast'), ('full', 'Full')], max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats_app', '0010_llmresponse_pipeline_profile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chat',
+            name='memory_token_budget',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MaxValueValidator(8000)]),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='memory_summarized_messages',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats_app', '0011_chat_memory_summarized_messages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmresponse',
+            name='source_history_id',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
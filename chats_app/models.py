@@ -1,12 +1,19 @@
+from django.core.validators import MaxValueValidator
 from django.db import models
 from auth_app.models import User
 from helper.models import UUIDPrimaryKey, TimeLine, IsActiveModel
 
 
+MAX_MEMORY_TOKEN_BUDGET = 8000
+
+
 class Chat(UUIDPrimaryKey, TimeLine, IsActiveModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chats')
     name = models.CharField(max_length=100, null=True, blank=True)
     is_new = models.BooleanField(default=False)
+    memory_token_budget = models.PositiveIntegerField(null=True, blank=True, validators=[MaxValueValidator(MAX_MEMORY_TOKEN_BUDGET)])
+    memory_summary = models.TextField(null=True, blank=True)
+    memory_summarized_messages = models.PositiveIntegerField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
@@ -32,11 +39,17 @@ class LLMResponse(UUIDPrimaryKey, TimeLine):
     thinked_thoughts = models.TextField(null=True, blank=True)
     time_taken = models.FloatField(null=True, blank=True)
     tool_responses = models.JSONField(default=list,null=True, blank=True)
+    pipeline_profile = models.CharField(max_length=10, choices=[('fast', 'Fast'), ('full', 'Full')], null=True, blank=True)
+    # Id of the prompt's row in the shared chat-history table, for turns created by backfill_llm_responses.
+    source_history_id = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
 
     
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['chat', 'created_at'], name='llmresponse_chat_created_idx'),
+        ]
         
         
 class ChatNotes(UUIDPrimaryKey, TimeLine):
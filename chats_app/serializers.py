@@ -10,6 +10,8 @@ class ChatSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chat
         fields = '__all__'
+        # Server-maintained memory state; a client-written summary would be injected into the system context.
+        read_only_fields = ['memory_summary', 'memory_summarized_messages']
 
     def get_created_at(self, obj):
         if not obj.created_at:
@@ -28,6 +30,7 @@ class LLMResponseSerializer(serializers.ModelSerializer):
     class Meta:
         model = LLMResponse
         fields = '__all__'
+        read_only_fields = ['pipeline_profile', 'source_history_id']
         
         
 class ChatNotesSerializer(serializers.ModelSerializer):
@@ -1,3 +1,4 @@
+import os
 from datetime import datetime, timedelta
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
@@ -12,6 +13,13 @@ class ChatViewSet(ModelViewSet):
     def get_queryset(self):
         return super().get_queryset().filter(user = self.request.user)
 
+    def perform_destroy(self, instance):
+        if os.getenv('MEMORY_RECALL', 'false').lower() == 'true':
+            # Imported here so the views do not load faiss and the embedding model unless recall is on.
+            from workflow_graphs.proxion.recall import recall_service
+            recall_service.remove_session(str(instance.user_id), str(instance.id))
+        super().perform_destroy(instance)
+
     def list(self, request, *args, **kwargs):
         today = datetime.now().date()
         
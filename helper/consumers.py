@@ -60,7 +60,8 @@ class BaseChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
     def save_llm_response(self, data):
         serializer = serializers.LLMResponseSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
+            # Read-only in the API, so it is passed to `save` rather than validated from `data`.
+            serializer.save(pipeline_profile=data.get('pipeline_profile'))
             return True
         return False
     
@@ -85,6 +86,7 @@ class BaseChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
         })
     
     async def send_llm_response(self, data = {}):
+        """Saves and sends the response; returns whether it was saved (the socket is closed otherwise)."""
         status = await self.save_llm_response(data)
         if status:
             await self.send_json({
@@ -97,6 +99,26 @@ class BaseChatAsyncJsonWebsocketConsumer(AsyncJsonWebsocketConsumer):
                 'data': data
             })
             await self.send_exception("Error saving LLM response")
+        return status
+    
+    async def send_chat_renamed(self, chat_id, name):
+        await self.send_json({
+            'type' : "chat_renamed",
+            'data' : {
+                'chat': chat_id,
+                'name': name
+            }
+        })
+    
+    async def send_notes_updated(self, chat_id, title, points):
+        await self.send_json({
+            'type' : "notes_updated",
+            'data' : {
+                'chat': chat_id,
+                'title': title,
+                'points': points
+            }
+        })
     
     async def send_json(self, *args, **kwargs):
         await asyncio.sleep(0.1)
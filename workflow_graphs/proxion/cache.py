@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+from .metrics import metrics
+
+
+class CachedToolFailure(RuntimeError):
+    """Raised instead of calling a tool again while its last failure for the same arguments is negatively cached."""
+
+
+class CachedResult(str):
+    """A tool result served from the cache rather than by a fresh call."""
+
+
+class CachedFailureResult(CachedResult):
+    """A negatively cached failure result (e.g. a rate-limit message), served from the cache."""
+
+
+class TransientResult(str):
+    """A failure result caused by a transient error (timeout, connection, rate limit); returned but never cached."""
+
+
+# Exceptions worth retrying right away, so they are never negatively cached.
+TRANSIENT_ERRORS = (TimeoutError, OSError)
+
+
+def normalize_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {key: normalize_value(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(item) for item in value]
+    return value
+
+
+def cache_key(tool_name: str, arguments: dict, normalize: Callable[[Any], Any] = normalize_value) -> str:
+    payload = json.dumps(normalize(arguments), sort_keys=True, default=str)
+    return f"tool:{tool_name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class RedisTier:
+    def __init__(self, url: str):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get(key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: dict, ttl: float):
+        self.client.setex(key, max(1, int(ttl)), json.dumps(entry))
+
+
+class DiskTier:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key.replace(":", "_") + ".json")
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key)) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return entry if entry["expires_at"] > time.time() else None
+
+    def set(self, key: str, entry: dict, ttl: float):
+        temporary = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(entry, file)
+        os.replace(temporary, self._path(key))
+
+
+class ToolResultCache:
+    """
+    A size-bounded LRU of tool results with per-entry TTLs, backed by an optional shared tier
+    (`TOOL_CACHE_REDIS_URL`, or an on-disk directory via `TOOL_CACHE_DIR`) so workers share hits.
+
+    Entries are `{"value", "negative", "expires_at"}`; negative entries remember failures so a
+    rate-limited or broken lookup is not retried on every request.
+    """
+
+    def __init__(self, max_entries: int = 2048, redis_url: str = None, disk_dir: str = None):
+        self.max_entries = max_entries
+        self._entries : "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.shared = None
+        if redis_url:
+            self.shared = RedisTier(redis_url)
+        elif disk_dir:
+            self.shared = DiskTier(disk_dir)
+
+    def _get_local(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["expires_at"] > now:
+                    self._entries.move_to_end(key)
+                    return entry
+                del self._entries[key]
+        return None
+
+    def _get_shared(self, key: str) -> Optional[dict]:
+        try:
+            entry = self.shared.get(key)
+        except Exception:
+            metrics.incr("tool_cache.shared_errors")
+            return None
+        if entry is not None:
+            self._store_local(key, entry)
+        return entry
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._get_local(key)
+        if entry is None and self.shared is not None:
+            entry = self._get_shared(key)
+        return entry
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """Like `get`, with the blocking shared-tier lookup run in a thread."""
+        entry = self._get_local(key)
+        if entry is None and self.shared is not None:
+            entry = await asyncio.to_thread(self._get_shared, key)
+        return entry
+
+    def _store_local(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _set_shared(self, key: str, entry: dict, ttl: float):
+        try:
+            self.shared.set(key, entry, ttl)
+        except Exception:
+            metrics.incr("tool_cache.shared_errors")
+
+    def _entry(self, value: Any, ttl: float, negative: bool) -> dict:
+        return {"value": value, "negative": negative, "expires_at": time.time() + ttl}
+
+    def set(self, key: str, value: Any, ttl: float, negative: bool = False):
+        entry = self._entry(value, ttl, negative)
+        self._store_local(key, entry)
+        if self.shared is not None:
+            self._set_shared(key, entry, ttl)
+
+    async def aset(self, key: str, value: Any, ttl: float, negative: bool = False):
+        entry = self._entry(value, ttl, negative)
+        self._store_local(key, entry)
+        if self.shared is not None:
+            await asyncio.to_thread(self._set_shared, key, entry, ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tool_cache = ToolResultCache(
+    max_entries=int(os.getenv('TOOL_CACHE_MAX_ENTRIES', 2048)),
+    redis_url=os.getenv('TOOL_CACHE_REDIS_URL'),
+    disk_dir=os.getenv('TOOL_CACHE_DIR'),
+)
+
+
+def cached_tool(tool_name: str, ttl: float, negative_ttl: float = 60, is_failure: Callable[[Any], bool] = None,
+                normalize: Callable[[Any], Any] = normalize_value, cache: ToolResultCache = None,
+                transient_errors: Tuple[type, ...] = TRANSIENT_ERRORS):
+    """
+    Caches a tool function's results by tool name and normalized arguments. Results for which
+    `is_failure` is true, and raised exceptions, are cached for `negative_ttl` seconds only;
+    `TransientResult`s and `transient_errors` are not cached at all. String hits come back as
+    `CachedResult` (`CachedFailureResult` for negative ones) so callers can tell them from fresh calls.
+    Coroutine functions get an async wrapper sharing the same entries.
+    """
+    def key_for(args, kwargs) -> str:
+        return cache_key(tool_name, {"args": args, "kwargs": kwargs}, normalize)
+
+    def record(entry):
+        if entry is not None:
+            if entry["negative"]:
+                metrics.incr(f"tool_cache.{tool_name}.negative_hits")
+                if isinstance(entry["value"], dict) and "error" in entry["value"]:
+                    raise CachedToolFailure(entry["value"]["error"])
+            else:
+                metrics.incr(f"tool_cache.{tool_name}.hits")
+        else:
+            metrics.incr(f"tool_cache.{tool_name}.misses")
+
+    def cached_value(entry):
+        value = entry["value"]
+        if not isinstance(value, str):
+            return value
+        return CachedFailureResult(value) if entry["negative"] else CachedResult(value)
+
+    def outcome(result):
+        """`(value, ttl, negative)` to store for a result."""
+        failed = is_failure is not None and is_failure(result)
+        return result, negative_ttl if failed else ttl, failed
+
+    def failure(error):
+        return {"error": f"{type(error).__name__}: {error}"}, negative_ttl, True
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                store, key = cache or tool_cache, key_for(args, kwargs)
+                entry = await store.aget(key)
+                record(entry)
+                if entry is not None:
+                    return cached_value(entry)
+                try:
+                    result = await func(*args, **kwargs)
+                except transient_errors:
+                    raise
+                except Exception as e:
+                    await store.aset(key, *failure(e))
+                    raise
+                if not isinstance(result, TransientResult):
+                    await store.aset(key, *outcome(result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store, key = cache or tool_cache, key_for(args, kwargs)
+            entry = store.get(key)
+            record(entry)
+            if entry is not None:
+                return cached_value(entry)
+            try:
+                result = func(*args, **kwargs)
+            except transient_errors:
+                raise
+            except Exception as e:
+                store.set(key, *failure(e))
+                raise
+            if not isinstance(result, TransientResult):
+                store.set(key, *outcome(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def hit_ratio(tool_name: str) -> Tuple[float, float]:
+    """`(hits, hit ratio)` of a tool's cache, counting negative hits as hits."""
+    hits = metrics.counter(f"tool_cache.{tool_name}.hits") + metrics.counter(f"tool_cache.{tool_name}.negative_hits")
+    total = hits + metrics.counter(f"tool_cache.{tool_name}.misses")
+    return hits, (hits / total if total else 0.0)
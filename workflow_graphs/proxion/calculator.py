@@ -0,0 +1,180 @@
+import re
+import ast
+import math
+import operator
+from typing import Any, Callable, Dict
+import numpy as np
+
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_ARRAY_SIZE = 10_000
+
+# Units and physical constants, in SI. Divide by a unit to convert: `3.26 * ly / pc`.
+UNITS : Dict[str, float] = {
+    "m": 1.0, "km": 1e3, "AU": 1.495978707e11, "ly": 9.4607304725808e15, "pc": 3.0856775814913673e16,
+    "kpc": 3.0856775814913673e19, "Mpc": 3.0856775814913673e22, "Gpc": 3.0856775814913673e25,
+    "s": 1.0, "minute": 60.0, "hour": 3600.0, "day": 86400.0, "yr": 3.15576e7, "Myr": 3.15576e13, "Gyr": 3.15576e16,
+    "kg": 1.0, "M_sun": 1.98841e30, "M_earth": 5.9722e24, "M_jup": 1.89813e27,
+    "R_sun": 6.957e8, "R_earth": 6.3781e6, "L_sun": 3.828e26, "J": 1.0, "W": 1.0, "eV": 1.602176634e-19,
+}
+CONSTANTS : Dict[str, float] = {
+    "pi": math.pi, "e": math.e, "inf": math.inf,
+    "c": 299792458.0, "G": 6.67430e-11, "h": 6.62607015e-34, "hbar": 1.054571817e-34, "k_B": 1.380649e-23,
+    "sigma_SB": 5.670374419e-8, "m_e": 9.1093837015e-31, "m_p": 1.67262192369e-27, "T_CMB": 2.7255,
+    **UNITS,
+}
+
+DEFAULT_H0 = 67.7
+DEFAULT_OM0 = 0.31
+_GRID_POINTS = 4096
+_AGE_Z_MAX = 1e8
+
+
+class CalculatorError(ValueError):
+    """Raised for expressions the calculator refuses or cannot evaluate."""
+
+
+class FlatLambdaCDM:
+    """
+    Flat ΛCDM with radiation (photons plus three massless neutrinos). Every function accepts scalars
+    or arrays of redshifts and integrates once on a shared grid in ln(1 + z), then interpolates.
+    """
+
+    def __init__(self, H0: float = DEFAULT_H0, Om0: float = DEFAULT_OM0):
+        self.H0 = H0
+        self.Om0 = Om0
+        self.Or0 = 4.153e-5 / (H0 / 100) ** 2
+        self.Ode0 = 1.0 - Om0 - self.Or0
+        self.hubble_distance = CONSTANTS["c"] / 1e3 / H0                       # Mpc
+        self.hubble_time = UNITS["Mpc"] / 1e3 / H0 / UNITS["Gyr"]                # Gyr
+
+    def efunc(self, z):
+        zp1 = 1.0 + np.asarray(z, dtype=float)
+        return np.sqrt(self.Or0 * zp1 ** 4 + self.Om0 * zp1 ** 3 + self.Ode0)
+
+    def _cumulative(self, z, integrand: Callable[[np.ndarray], np.ndarray], z_max: float = None):
+        z = np.asarray(z, dtype=float)
+        if np.any(z < 0):
+            raise CalculatorError("Redshifts must be non-negative.")
+        x = np.linspace(0.0, np.log1p(z_max if z_max is not None else max(float(z.max(initial=0.0)), 1e-8)), _GRID_POINTS)
+        values = integrand(np.expm1(x))
+        cumulative = np.concatenate(([0.0], np.cumsum((values[1:] + values[:-1]) * np.diff(x) / 2)))
+        return np.interp(np.log1p(z), x, cumulative), cumulative[-1]
+
+    def hubble(self, z):
+        """H(z) in km/s/Mpc."""
+        return self.H0 * self.efunc(z)
+
+    def comoving_distance(self, z):
+        """Line-of-sight comoving distance in Mpc."""
+        return self.hubble_distance * self._cumulative(z, lambda zs: (1.0 + zs) / self.efunc(zs))[0]
+
+    def luminosity_distance(self, z):
+        return (1.0 + np.asarray(z, dtype=float)) * self.comoving_distance(z)
+
+    def angular_diameter_distance(self, z):
+        return self.comoving_distance(z) / (1.0 + np.asarray(z, dtype=float))
+
+    def lookback_time(self, z):
+        """Lookback time in Gyr."""
+        return self.hubble_time * self._cumulative(z, lambda zs: 1.0 / self.efunc(zs))[0]
+
+    def age(self, z):
+        """Age of the universe at redshift z, in Gyr."""
+        lookback, total = self._cumulative(z, lambda zs: 1.0 / self.efunc(zs), z_max=_AGE_Z_MAX)
+        return self.hubble_time * (total - lookback)
+
+
+def _cosmology_function(name: str) -> Callable:
+    def function(z, H0: float = DEFAULT_H0, Om0: float = DEFAULT_OM0):
+        return getattr(FlatLambdaCDM(H0, Om0), name)(z)
+    function.__name__ = name
+    return function
+
+
+def _linspace(start, stop, num=50):
+    if not 0 < int(num) <= MAX_ARRAY_SIZE:
+        raise CalculatorError(f"linspace supports 1 to {MAX_ARRAY_SIZE} points.")
+    return np.linspace(start, stop, int(num))
+
+
+FUNCTIONS : Dict[str, Callable] = {
+    "sqrt": np.sqrt, "exp": np.exp, "log": np.log, "ln": np.log, "log10": np.log10, "abs": np.abs,
+    "sin": np.sin, "cos": np.cos, "tan": np.tan, "arcsin": np.arcsin, "arccos": np.arccos, "arctan": np.arctan,
+    "radians": np.radians, "degrees": np.degrees, "min": np.min, "max": np.max, "sum": np.sum, "mean": np.mean,
+    "round": np.round, "linspace": _linspace,
+    **{name: _cosmology_function(name) for name in (
+        "hubble", "comoving_distance", "luminosity_distance", "angular_diameter_distance", "lookback_time", "age",
+    )},
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+def _evaluate(node: ast.AST) -> Any:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in CONSTANTS:
+            return CONSTANTS[node.id]
+        raise CalculatorError(f"Unknown name '{node.id}'.")
+    if isinstance(node, (ast.List, ast.Tuple)):
+        if len(node.elts) > MAX_ARRAY_SIZE:
+            raise CalculatorError(f"Arrays are limited to {MAX_ARRAY_SIZE} values.")
+        return np.asarray([_evaluate(element) for element in node.elts], dtype=float)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow):
+            # Python ints would happily build a million-digit number; floats overflow to inf instead.
+            left, right = np.asarray(left, dtype=float), np.asarray(right, dtype=float)
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+        args = [_evaluate(argument) for argument in node.args]
+        kwargs = {keyword.arg: _evaluate(keyword.value) for keyword in node.keywords if keyword.arg}
+        return FUNCTIONS[node.func.id](*args, **kwargs)
+    raise CalculatorError(f"Unsupported syntax: {type(node).__name__}.")
+
+
+def evaluate(expression: str) -> Any:
+    """Safely evaluates an arithmetic expression over numbers, arrays, constants, units and the functions above."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalculatorError(f"Expressions are limited to {MAX_EXPRESSION_LENGTH} characters.")
+    try:
+        tree = ast.parse(expression.replace("^", "**").strip(), mode="eval")
+    except SyntaxError as e:
+        raise CalculatorError(f"Invalid expression: {e.msg}.") from None
+    with np.errstate(all="ignore"):
+        try:
+            return _evaluate(tree)
+        except CalculatorError:
+            raise
+        except (ArithmeticError, TypeError, ValueError) as e:
+            raise CalculatorError(str(e)) from None
+
+
+RESULT_UNITS = {
+    "hubble": "km/s/Mpc", "comoving_distance": "Mpc", "luminosity_distance": "Mpc",
+    "angular_diameter_distance": "Mpc", "lookback_time": "Gyr", "age": "Gyr",
+}
+
+
+def format_result(value: Any, expression: str = None) -> str:
+    """Six significant digits; with the expression, as `expression = result`, plus the unit of a bare cosmology call."""
+    value = np.asarray(value)
+    if value.ndim == 0:
+        result = f"{float(value):.6g}"
+    else:
+        result = "[" + ", ".join(f"{float(item):.6g}" for item in value.ravel()) + "]"
+    if expression is None:
+        return result
+    call = re.match(r"^\s*(\w+)\(.*\)\s*$", expression)
+    unit = RESULT_UNITS.get(call.group(1)) if call else None
+    return f"{expression.strip()} = {result}{f' {unit}' if unit else ''}"
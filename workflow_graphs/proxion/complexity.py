@@ -0,0 +1,69 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Literal
+from .metrics import metrics
+
+
+PipelineProfile = Literal["fast", "full"]
+
+COMPLEX_CUES = re.compile(
+    r"\b(derive|derivation|prove|proof|compare|comparison|contrast|difference between|relationship between|"
+    r"implications?|why (does|do|is|are|did)|how (does|do|would|could|did)|mechanism|in detail|step[- ]by[- ]step|"
+    r"equations?|mathematic(al|s)|calculate|quantum|relativity|tensor|metric|friedmann|inflation|entropy|"
+    r"what would happen|what if|pros and cons|history of|evolution of|evidence for|theories)\b",
+    re.I,
+)
+SIMPLE_CUES = re.compile(
+    r"^\s*(what('s| is| are)|who|when|where|which|is|are|does|define|"
+    r"how (big|far|old|many|much|hot|cold|long|large|heavy|fast))\b",
+    re.I,
+)
+URL_OR_RECENCY = re.compile(r"https?://|\b(latest|recent(ly)?|today|news|this (week|month|year)|20[2-9]\d)\b", re.I)
+
+
+@dataclass
+class ComplexityEstimate:
+    profile : PipelineProfile
+    score : float
+    features : Dict[str, float] = field(default_factory=dict)
+
+
+class ComplexityEstimator:
+    """
+    Scores a query from cheap lexical features (length, reasoning cues, multiple questions, simple
+    factual openers, mode) and picks a pipeline profile: `fast` skips section generation and the
+    evaluate/refine loop, `full` runs everything. `PIPELINE_PROFILE=fast|full` forces a profile.
+    """
+
+    MODE_WEIGHTS = {"Scientific": 0.3, "Story": 0.1, "Casual": 0.0, "Kids": -0.2}
+
+    def __init__(self, threshold: float = 0.5, forced_profile: str = None):
+        self.threshold = threshold
+        self.forced_profile = forced_profile if forced_profile in ("fast", "full") else None
+
+    def features(self, query: str, mode: str = "Casual") -> Dict[str, float]:
+        words = len(query.split())
+        return {
+            "length": min(words / 25, 1.0),
+            "complex_cues": 0.6 * len(COMPLEX_CUES.findall(query)),
+            "multiple_questions": 0.4 if query.count("?") > 1 or len(re.findall(r"\b(and|also|then)\b", query, re.I)) > 1 else 0.0,
+            "simple_opener": -0.5 if SIMPLE_CUES.match(query) and words <= 12 else 0.0,
+            "needs_tools": 0.6 if URL_OR_RECENCY.search(query) else 0.0,
+            "mode": self.MODE_WEIGHTS.get(mode, 0.0),
+        }
+
+    def estimate(self, query: str, mode: str = "Casual") -> ComplexityEstimate:
+        features = self.features(query, mode)
+        score = sum(features.values())
+        profile = self.forced_profile or ("full" if score >= self.threshold else "fast")
+        metrics.incr(f"pipeline.{profile}")
+        metrics.observe("pipeline.complexity_score", score)
+        return ComplexityEstimate(profile=profile, score=score, features=features)
+
+
+def get_complexity_estimator() -> ComplexityEstimator:
+    return ComplexityEstimator(
+        threshold=float(os.getenv('PIPELINE_COMPLEXITY_THRESHOLD', 0.5)),
+        forced_profile=os.getenv('PIPELINE_PROFILE', 'auto'),
+    )
@@ -0,0 +1,79 @@
+import os
+from typing import Dict, List
+from ai.extractive import content_words
+from .metrics import metrics
+from .relevance import BM25, jaccard, select_within_budget, split_sentences_lossless
+from .tokens import LlamaTokenCounter, get_token_counter
+
+
+class ToolResponseCompressor:
+    """
+    Shrinks tool responses before they are injected into prompts: near-duplicate sentences across
+    tools are dropped, the rest are ranked by BM25 against the query (and, at half weight, the
+    sections), and each tool and all tools together are cut to their token budgets, keeping the
+    surviving sentences in their original order. Responses already under `min_tokens` pass through.
+    """
+
+    def __init__(self, per_tool_budget: int = 600, total_budget: int = 1500, min_tokens: int = 64,
+                 duplicate_threshold: float = 0.8, token_counter : LlamaTokenCounter = None):
+        self.per_tool_budget = per_tool_budget
+        self.total_budget = total_budget
+        self.min_tokens = min_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.token_counter = token_counter or get_token_counter()
+
+    def _deduplicate(self, sentences: List[tuple]) -> List[tuple]:
+        kept, seen = [], []
+        for tool, sentence in sentences:
+            words = set(content_words(sentence))
+            if words and any(jaccard(words, other) >= self.duplicate_threshold for other in seen):
+                continue
+            if words:
+                seen.append(words)
+            kept.append((tool, sentence))
+        return kept
+
+    def compress(self, tool_responses: Dict[str, object], query: str, sections: List[str] = ()) -> Dict[str, str]:
+        count = self.token_counter.count_text
+        responses = {tool: str(response) for tool, response in tool_responses.items()}
+        tokens_in = sum(count(response) for response in responses.values())
+
+        passthrough = {tool: response for tool, response in responses.items() if count(response) <= self.min_tokens}
+        sentences = self._deduplicate([
+            (tool, sentence)
+            for tool, response in responses.items() if tool not in passthrough
+            for sentence in split_sentences_lossless(response)
+        ])
+        texts = [sentence for _, sentence in sentences]
+        index = BM25(texts)
+        section_scores = index.scores(" ".join(sections)) if sections else [0.0] * len(texts)
+        scores = [score + 0.5 * section for score, section in zip(index.scores(query), section_scores)]
+
+        selected = []
+        for tool in responses:
+            positions = [i for i, (owner, _) in enumerate(sentences) if owner == tool]
+            chosen = select_within_budget([texts[i] for i in positions], [scores[i] for i in positions], self.per_tool_budget, count)
+            selected.extend(positions[i] for i in chosen)
+        remaining = self.total_budget - sum(count(response) for response in passthrough.values())
+        selected = [selected[i] for i in select_within_budget(
+            [texts[i] for i in selected], [scores[i] for i in selected], max(remaining, 0), count
+        )]
+
+        compressed = dict(passthrough)
+        for position in sorted(selected):
+            tool, sentence = sentences[position]
+            compressed[tool] = f"{compressed[tool]}\n{sentence}" if tool in compressed else sentence
+        compressed = {tool: compressed[tool] for tool in responses if tool in compressed}
+
+        tokens_out = sum(count(response) for response in compressed.values())
+        metrics.incr("compression.tokens_in", tokens_in)
+        metrics.incr("compression.tokens_out", tokens_out)
+        metrics.observe("compression.ratio", tokens_out / tokens_in if tokens_in else 1.0)
+        return compressed
+
+
+def get_tool_response_compressor() -> ToolResponseCompressor:
+    return ToolResponseCompressor(
+        per_tool_budget=int(os.getenv('TOOL_RESPONSE_TOKENS_PER_TOOL', 600)),
+        total_budget=int(os.getenv('TOOL_RESPONSE_TOKENS_TOTAL', 1500)),
+    )
@@ -0,0 +1,44 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+executor = ThreadPoolExecutor(max_workers=int(os.getenv('EMBEDDING_WORKERS', 2)), thread_name_prefix="embeddings")
+
+_embeddings : Optional[HuggingFaceEmbeddings] = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings() -> HuggingFaceEmbeddings:
+    """The process-wide sentence embedding model (`EMBEDDING_MODEL`), loaded on first use."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            _embeddings = HuggingFaceEmbeddings(
+                model_name=os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL),
+                encode_kwargs={"normalize_embeddings": True},
+            )
+        return _embeddings
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Unit-length float32 embeddings, one row per text, ready for inner-product FAISS indexes."""
+    return np.asarray(get_embeddings().embed_documents(texts), dtype="float32")
+
+
+def embed_query(text: str) -> np.ndarray:
+    return np.asarray([get_embeddings().embed_query(text)], dtype="float32")
+
+
+async def aembed_texts(texts: List[str]) -> np.ndarray:
+    return await asyncio.get_running_loop().run_in_executor(executor, embed_texts, texts)
+
+
+async def aembed_query(text: str) -> np.ndarray:
+    return await asyncio.get_running_loop().run_in_executor(executor, embed_query, text)
@@ -1,35 +1,77 @@
+import os
 import time
-import groq
+import asyncio
+import logging
 from typing import List
 from langgraph.graph import StateGraph, START, END
 from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import SystemMessage
 from langchain_core.tools import BaseTool
-from .prompts import PROXION_SYSTEM_MESSAGE
+from .prompt_builder import PromptAssembler
 from .schemas import WorkFlowState, SectionsOutput, CosmologyQueryCheck, ResponseFeedback
-from .tools import wikipedia_tool, calculator_tool, web_url_tool, duckduckgo_search_tool
-from chats_app.models import Chat
+from .tools import knowledge_base_tool, wikipedia_tool, calculator_tool, web_url_tool, duckduckgo_search_tool
+from .tools import CachedToolFailure, CircuitOpenError, ainvoke_tool, resolve_tool
+from .knowledge_base import knowledge_base
+from chats_app.models import Chat, MAX_MEMORY_TOKEN_BUDGET
 from auth_app.models import User
-from .memory import Memory
+from .memory import Memory, SummarizingMemory
+from .hedging import HedgedLLM
+from .structured import TolerantStructuredOutput
+from .tokens import get_token_counter
+from .recall import recall_service
+from .compression import get_tool_response_compressor
+from .tool_runtime import tool_executor
+from .router import ToolRouter
+from .singleflight import single_flight, single_flight_key
+from .complexity import get_complexity_estimator
+from .sections import assemble_sections, normalize_title, splice_sections, split_sections, strip_heading
+
+
+logger = logging.getLogger(__name__)
 
 
 
 class ProxionWorkflow:
-    def __init__(self, chat : Chat, user : User, consumer : object, llm : ChatGroq, tool_llm_instance : ChatGroq = None, verbose=True):
+    HEDGED_NODES = ("multi_step_thinking", "apply_explanation_mode", "generate_section")
+    DEFAULT_MEMORY_TOKENS = 3000
+    RECALL_TOKEN_BUDGET = int(os.getenv('RECALL_TOKEN_BUDGET', 600))
+    SECTION_CONCURRENCY = int(os.getenv('SECTION_CONCURRENCY', 4))
+    SECTION_STYLES = {
+        "Scientific": "technical and detailed, with precise terminology and a formal tone",
+        "Story": "an engaging and imaginative story",
+        "Casual": "friendly and easy to understand, suitable for everyday conversation",
+        "Kids": "very simple and fun so that a child can understand, with short sentences, easy words and emojis",
+    }
+
+    def __init__(self, chat : Chat, user : User, consumer : object, llm : ChatGroq, tool_llm_instance : ChatGroq = None, verbose=True, hedged_nodes=HEDGED_NODES):
         self.chat = chat
         self.user = user
         self.consumer = consumer
         self.thinked_thoughts = str()
         self.llm : ChatGroq = llm
-        self.memory = Memory.get_memory(str(chat.id), str(self.user.id), 3000, self.llm, True, False, 'human')
         self.tool_llm : ChatGroq = tool_llm_instance if tool_llm_instance else llm
+        self.token_counter = get_token_counter()
+        self.recall = recall_service if os.getenv('MEMORY_RECALL', 'false').lower() == 'true' else None
+        self.recalled_turns = []
+        self.prompts = PromptAssembler(self.token_counter)
+        self.compressor = get_tool_response_compressor()
+        self.complexity_estimator = get_complexity_estimator()
+        self.generation_strategy = os.getenv('GENERATION_STRATEGY', 'map_reduce')
+        self.stream_structured = os.getenv('STRUCTURED_STREAMING', 'true').lower() == 'true'
         self.verbose = verbose
         self.tools : List[BaseTool] = [wikipedia_tool, calculator_tool, web_url_tool, duckduckgo_search_tool]
+        if knowledge_base.is_available:
+            self.tools.insert(0, knowledge_base_tool)
         
-        self.cosmology_query_check = self.llm.with_structured_output(CosmologyQueryCheck, method="json_mode")
-        self.section_generator = self.llm.with_structured_output(SectionsOutput, method="json_mode")
-        self.evaluator = self.llm.with_structured_output(ResponseFeedback, method="json_mode")
+        self.cosmology_query_check = TolerantStructuredOutput(self.llm, CosmologyQueryCheck)
+        self.section_generator = TolerantStructuredOutput(self.llm, SectionsOutput)
+        self.evaluator = TolerantStructuredOutput(self.llm, ResponseFeedback)
         self.knowledge_retriever = self.tool_llm.bind_tools(self.tools)
+        self.single_flight = single_flight if os.getenv('SINGLE_FLIGHT', 'true').lower() == 'true' else None
+        self.tool_router = ToolRouter([tool.name for tool in self.tools]) if os.getenv('TOOL_ROUTER', 'local') == 'local' else None
+        self.hedged_llms = {}
+        if os.getenv('PROXION_HEDGING', 'false').lower() == 'true':
+            self.hedged_llms = {node: HedgedLLM(self.llm, node) for node in hedged_nodes or ()}
         
         
         
@@ -53,18 +95,60 @@ class ProxionWorkflow:
         self.thinked_thoughts += thought      
     
     
-    async def _get_history(self):
-        return self.memory.messages
-      
-            
+    def _llm_for(self, node: str):
+        return self.hedged_llms.get(node, self.llm)
+
+
+    @staticmethod
+    def _query_is_routable(fields: dict) -> bool:
+        return fields.get("is_cosmology_related") is True and "requires_tool_call" in fields
+
+
+    @staticmethod
+    def _evaluation_is_final(fields: dict) -> bool:
+        return fields.get("is_satisfactory") is True
+
+
+    async def _recall_turns(self, user_query: str) -> list:
+        if self.recall is None:
+            return []
+        window_queries = {message.content.rsplit(" \n @", 1)[0] for message in self.memory.messages if message.type == "human"}
+        try:
+            return await self.recall.arecall(str(self.user.id), user_query, self.RECALL_TOKEN_BUDGET, exclude=window_queries)
+        except Exception:
+            logger.exception("Recall failed for user %s", self.user.id)
+            return []
+
+
+    def _recalled_messages(self) -> list:
+        if not self.recalled_turns:
+            return []
+        turns = "\n\n".join(f"User: {turn['human']}\nProxion: {turn['ai']}" for turn in self.recalled_turns)
+        return [SystemMessage(content=f"Relevant earlier conversation:\n\n{turns}")]
+
+
+    async def _route_tools(self, user_query: str, sections: List[str], state: WorkFlowState):
+        """Local tool calls for the query, or `None` to let the tool-calling model decide."""
+        if self.tool_router is None:
+            return None
+        try:
+            tool_calls = await self.tool_router.aroute(user_query, sections)
+        except Exception:
+            logger.exception("Tool router failed, falling back to the LLM router")
+            return None
+        if tool_calls is not None:
+            await self._record_thinked_thoughts(f"\nI matched the query to {len(tool_calls)} tool call(s) directly, without a tool-selection call.", state)
+        return tool_calls
+
     async def _get_messages(self, new_message : str):
-        history = await self._get_history()
-        messages = [
-            SystemMessage(content=PROXION_SYSTEM_MESSAGE),
-            *history,
-            HumanMessage(content=new_message)
-        ]        
-        return messages
+        return self.prompts.build(new_message)
+
+
+    async def _build_memory(self) -> Memory:
+        max_tokens = min(self.chat.memory_token_budget or self.DEFAULT_MEMORY_TOKENS, MAX_MEMORY_TOKEN_BUDGET)
+        if os.getenv('MEMORY_MODE', 'window') == 'summary':
+            return await SummarizingMemory.aget_memory(str(self.chat.id), str(self.user.id), max_tokens, self.token_counter, 'human', llm=self.llm)
+        return await Memory.aget_memory(str(self.chat.id), str(self.user.id), max_tokens, self.token_counter, 'human')
 
 
     async def _build_workflow(self):
@@ -74,6 +158,7 @@ class ProxionWorkflow:
         builder.add_node("Query Validation", self.validate_query)
         builder.add_node("Generate Relevant Sections", self.generate_sections)
         builder.add_node("Generate Extra Knowledge", self.extra_knowledge)
+        builder.add_node("Compress Tool Responses", self.compress_tool_responses)
         builder.add_node("Generate Initial Response", self.multi_step_thinking)
         builder.add_node("Apply Explanation Mode", self.apply_explanation_mode)
         builder.add_node("Evaluate Response Quality", self.evaluate_response)
@@ -81,16 +166,26 @@ class ProxionWorkflow:
         builder.add_node("Finalize and Provide Response", self.final_response)
 
         builder.add_edge(START, "Query Validation")
-        builder.add_edge("Generate Extra Knowledge", "Generate Initial Response")
+        builder.add_edge("Generate Extra Knowledge", "Compress Tool Responses")
+        builder.add_edge("Compress Tool Responses", "Generate Initial Response")
         builder.add_edge("Generate Initial Response", "Apply Explanation Mode")
-        builder.add_edge("Apply Explanation Mode", "Evaluate Response Quality")
         builder.add_edge("Refine Response", "Evaluate Response Quality")
         builder.add_edge("Finalize and Provide Response", END)
 
         builder.add_conditional_edges(
             "Query Validation",
-            lambda state: "Unreleted To Cosmology" if not state["is_cosmology_related"] else "Releted To Cosmology",
-            {"Unreleted To Cosmology": END, "Releted To Cosmology": "Generate Relevant Sections"}
+            lambda state: (
+                "Unreleted To Cosmology" if not state["is_cosmology_related"]
+                else "Simple Query" if state["pipeline_profile"] == "fast"
+                else "Releted To Cosmology"
+            ),
+            {"Unreleted To Cosmology": END, "Simple Query": "Generate Initial Response", "Releted To Cosmology": "Generate Relevant Sections"}
+        )
+
+        builder.add_conditional_edges(
+            "Apply Explanation Mode",
+            lambda state: "Skip Evaluation" if state["pipeline_profile"] == "fast" else "Evaluate",
+            {"Skip Evaluation": "Finalize and Provide Response", "Evaluate": "Evaluate Response Quality"}
         )
         
         builder.add_conditional_edges(
@@ -116,20 +211,24 @@ class ProxionWorkflow:
         query_prompt = (
             f"Validate if the query '{state['user_query']}' is related to cosmology or "
             f"asking about chatbot name or developer details. "
-            "Respond in JSON format with the following keys:\n"
+            "Respond in JSON format with the following keys, in this order:\n"
             "- `is_cosmology_related` (bool): Indicates whether the query is valid.\n"
+            "- `requires_tool_call` (bool): Always include this field. If the query requires external data sources (e.g., real-time space data), set this to `true`. Otherwise, set it to `false`.\n"
             "- `response` (str): If the query is not related to cosmology:\n"
             "  - For greetings (e.g., 'Hi', 'Hello'), respond warmly (e.g., 'Hi! How can I assist you today? 😊').\n"
             "  - For farewells (e.g., 'Goodbye', 'See you'), respond appropriately (e.g., 'Goodbye! Have a great day!').\n"
             "  - For chatbot-related queries (e.g., 'Who are you?'), provide relevant details (e.g., 'I am Proxion, an AI assistant created by Madhu Bagamma Gari, specializing in cosmology and space sciences.').\n"
-            "  - For completely unrelated questions (e.g., 'Who is Modi?'), politely inform the user that Proxion only focuses on cosmology (e.g., 'I focus only on cosmology-related topics. Let’s talk about the wonders of the universe!').\n"
-            "- `requires_tool_call` (bool): Always include this field. If the query requires external data sources (e.g., real-time space data), set this to `true`. Otherwise, set it to `false`."
+            "  - For completely unrelated questions (e.g., 'Who is Modi?'), politely inform the user that Proxion only focuses on cosmology (e.g., 'I focus only on cosmology-related topics. Let’s talk about the wonders of the universe!')."
         )
 
         await self._yield_status("⏳ Processing query...", state)
         await self._record_thinked_thoughts("\nI have prepared the validation prompt. Now, I will send it for processing.", state)
 
-        result: CosmologyQueryCheck = await self.cosmology_query_check.ainvoke(await self._get_messages(query_prompt))
+        # A cosmology query can be routed once both flags are in; only other queries need the `response` text.
+        result: CosmologyQueryCheck = await self.cosmology_query_check.ainvoke(
+            await self._get_messages(query_prompt),
+            ready=self._query_is_routable if self.stream_structured else None,
+        )
 
         await self._yield_status("✅ Validation complete", state)
         await self._record_thinked_thoughts("\nI received the validation result. Now, let me analyze it.", state)
@@ -141,6 +240,9 @@ class ProxionWorkflow:
             state
         )
 
+        # Tool lookups only happen on the full path, so a query that needs them is upgraded.
+        pipeline_profile = "full" if result.requires_tool_call else state["pipeline_profile"]
+
         return {
             "is_cosmology_related": result.is_cosmology_related, 
             "final_response": {
@@ -148,8 +250,10 @@ class ProxionWorkflow:
                 "prompt": state["user_query"],
                 "response": result.response,
                 "tool_responses": state.get("tool_responses", {}),
+                "pipeline_profile": pipeline_profile,
             }, 
-            "requires_tool_call": result.requires_tool_call
+            "requires_tool_call": result.requires_tool_call,
+            "pipeline_profile": pipeline_profile,
         }
 
 
@@ -191,57 +295,99 @@ class ProxionWorkflow:
         sections = state["sections"]
         sections_text = ", ".join(sections)
 
-        await self._record_thinked_thoughts("\nI have the user query and topic breakdown. Now, I will formulate the retrieval prompt.", state)
-
-        retrieval_prompt = (
-            f"Given the following user query:\n\n"
-            f"{user_query}\n\n"
-            f"And the Topic breakdown sections:\n\n"
-            f"{sections_text}\n\n"
-            f"What additional knowledge or tool call suggestions would improve this response?"
-        )
-
-        await self._yield_status("🔍 Retrieving additional knowledge...", state)
-        await self._record_thinked_thoughts("\nThe retrieval prompt is ready. I will now send it for processing.", state)
+        tool_calls = await self._route_tools(user_query, sections, state)
+        if tool_calls is None:
+            await self._record_thinked_thoughts("\nI have the user query and topic breakdown. Now, I will formulate the retrieval prompt.", state)
+
+            retrieval_prompt = (
+                f"Given the following user query:\n\n"
+                f"{user_query}\n\n"
+                f"And the Topic breakdown sections:\n\n"
+                f"{sections_text}\n\n"
+                f"What additional knowledge or tool call suggestions would improve this response?"
+            )
+            if knowledge_base_tool in self.tools:
+                retrieval_prompt += (
+                    f"\n\nPrefer the '{knowledge_base_tool.name}' tool for established cosmology and astronomy; "
+                    f"use the web tools only for recent events or topics it cannot cover."
+                )
+
+            await self._yield_status("🔍 Retrieving additional knowledge...", state)
+            await self._record_thinked_thoughts("\nThe retrieval prompt is ready. I will now send it for processing.", state)
+
+            response = await self.knowledge_retriever.ainvoke(await self._get_messages(retrieval_prompt))
+            tool_calls = response.tool_calls
 
-        response = self.knowledge_retriever.ainvoke(await self._get_messages(retrieval_prompt))
         tools_by_name = {tool.name: tool for tool in self.tools}
         tool_responses = {}
 
         await self._record_thinked_thoughts("\nI have received tool call suggestions. Now, I will process each one.", state)
         await self._yield_status("🛠️ Processing tool call suggestions...", state)
 
-        for tool_call in response.tool_calls:
-            tool = tools_by_name.get(tool_call["name"])
-            if not tool:
+        for tool_call in tool_calls:
+            if tool_call["name"] not in tools_by_name:
                 await self._record_thinked_thoughts(f"\nThe requested tool '{tool_call['name']}' does not exist. Skipping this call.", state)
                 continue
 
+            tool = resolve_tool(tool_call["name"], tools_by_name)
+            if tool is None:
+                await self._yield_status(f"⚠️ {tool_call['name']} is temporarily unavailable, continuing without it.", state)
+                tool_responses[tool_call["name"]] = f"Error: {tool_call['name']} is temporarily unavailable."
+                continue
+            if tool.name != tool_call["name"]:
+                await self._yield_status(f"⚠️ {tool_call['name']} is temporarily unavailable, using {tool.name} instead.", state)
+
             retries = 3
             for attempt in range(1, retries + 1):
                 try:
-                    await self._record_thinked_thoughts(f"\nAttempting to invoke the tool '{tool_call['name']}' (Attempt {attempt}/{retries}).", state)
+                    await self._record_thinked_thoughts(f"\nAttempting to invoke the tool '{tool.name}' (Attempt {attempt}/{retries}).", state)
 
-                    observation = await tool.ainvoke(tool_call["args"])  
-                    tool_responses[tool_call["name"]] = observation
+                    observation = await ainvoke_tool(tool, tool_call["args"])
+                    tool_responses[tool.name] = f"{tool_responses[tool.name]}\n\n{observation}" if tool.name in tool_responses else observation
 
-                    await self._record_thinked_thoughts(f"\nSuccessfully received response from '{tool_call['name']}'. \nResponse: {observation}", state)
+                    await self._record_thinked_thoughts(f"\nSuccessfully received response from '{tool.name}'. \nResponse: {observation}", state)
                     break  
 
-                except groq.BadRequestError:
-                    await self._record_thinked_thoughts(f"\nTool '{tool_call['name']}' invocation failed on attempt {attempt}. Retrying...", state)
+                except CircuitOpenError as e:
+                    tool_responses[tool.name] = f"Error: {e}"
+                    await self._record_thinked_thoughts(f"\n{e} Skipping further attempts.", state)
+                    break
+
+                except CachedToolFailure as e:
+                    # The same call failed moments ago with a non-transient error; retrying would hit the cache again.
+                    tool_responses[tool.name] = f"Error: {e}"
+                    await self._record_thinked_thoughts(f"\nTool '{tool.name}' recently failed with these arguments ({e}). Skipping further attempts.", state)
+                    break
+
+                except Exception as e:
+                    await self._record_thinked_thoughts(f"\nTool '{tool.name}' invocation failed on attempt {attempt} ({type(e).__name__}). Retrying...", state)
 
                     if attempt == retries:
                         error_message = f"Error: Tool invocation failed after {retries} attempts."
-                        tool_responses[tool_call["name"]] = error_message
+                        tool_responses[tool.name] = error_message
 
-                        await self._record_thinked_thoughts(f"\nMaximum retries reached for '{tool_call['name']}'. Storing failure response: {error_message}", state)
+                        await self._record_thinked_thoughts(f"\nMaximum retries reached for '{tool.name}'. Storing failure response: {error_message}", state)
 
         await self._yield_status("📚 Extra knowledge retrieval complete!", state)
         await self._record_thinked_thoughts("\nTool responses have been processed. Returning final results.", state)
 
         return {"tool_responses": tool_responses}
 
+
+    async def compress_tool_responses(self, state: WorkFlowState) -> dict:
+        await self._verbose_print("Compressing tool responses...", state)
+        tool_responses = state.get("tool_responses", {})
+        if not tool_responses:
+            return {"tool_responses": tool_responses}
+
+        await self._yield_status("🗜️ Condensing retrieved knowledge...", state)
+        loop = asyncio.get_running_loop()
+        compressed = await loop.run_in_executor(
+            tool_executor, self.compressor.compress, tool_responses, state["user_query"], state.get("sections", [])
+        )
+        await self._record_thinked_thoughts("\nI have condensed the tool responses to the passages most relevant to the query and sections.", state)
+        return {"tool_responses": compressed}
+
     
     async def multi_step_thinking(self, state: WorkFlowState) -> dict:
         await self._verbose_print("Generating response using structured sections.", state)
@@ -261,6 +407,11 @@ class ProxionWorkflow:
         else:
             tool_responses_text = "No additional tool responses available."
 
+        if self.generation_strategy == "map_reduce" and len(sections) >= 2:
+            mode = state.get("selected_mode", "Casual")
+            generated_response, mode_applied = await self._generate_by_sections(user_query, sections, tool_responses_text, mode, state)
+            return {"generated_response": generated_response, "mode_applied": mode_applied}
+
         await self._yield_status("🏗️ Constructing final structured prompt...", state)
         await self._record_thinked_thoughts("\nI have gathered the tool responses. Now, I will construct the final structured prompt.", state)
 
@@ -276,7 +427,7 @@ class ProxionWorkflow:
         await self._record_thinked_thoughts("\nThe final prompt is ready. Now, I will generate a response.", state)
 
         try:
-            response = await self.llm.ainvoke(await self._get_messages(prompt))
+            response = await self._llm_for("multi_step_thinking").ainvoke(await self._get_messages(prompt))
             generated_response = response.content
         except Exception as e:
             generated_response = f"Error: Unable to generate a response due to {str(e)}."
@@ -288,10 +439,68 @@ class ProxionWorkflow:
         return {"generated_response": generated_response}
 
 
+    async def _generate_section(self, user_query: str, title: str, sections: List[str], tool_responses_text: str,
+                                mode: str, semaphore : asyncio.Semaphore) -> str:
+        # Everything before the section title is identical across sections, so it shares the prompt prefix.
+        prompt = (
+            f"User Query: {user_query}\n\n"
+            f"The answer is organised into these sections: {', '.join(sections)}\n\n"
+            f"Additional tool responses:\n{tool_responses_text}\n\n"
+            f"Write only the body of the section titled \"{title}\", without repeating its heading. "
+            f"Use Markdown (### for sub-headings), stay within this section's scope and do not introduce or conclude the whole answer."
+        )
+        if mode in self.SECTION_STYLES:
+            prompt += f" Make it {self.SECTION_STYLES[mode]}."
+        async with semaphore:
+            response = await self._llm_for("generate_section").ainvoke(await self._get_messages(prompt))
+        return strip_heading(response.content, title)
+
+    async def _generate_by_sections(self, user_query: str, sections: List[str], tool_responses_text: str, mode: str,
+                                    state: WorkFlowState) -> tuple:
+        """
+        Map-reduce generation: every section concurrently (at most `SECTION_CONCURRENCY` at a time), then
+        Markdown assembly. Returns the response and whether it is already written in the selected mode.
+        """
+        await self._yield_status(f"🧩 Generating {len(sections)} sections in parallel...", state)
+        await self._record_thinked_thoughts(f"\nI will write the {len(sections)} sections concurrently and assemble them in order.", state)
+
+        semaphore = asyncio.Semaphore(self.SECTION_CONCURRENCY)
+        results = await asyncio.gather(
+            *(self._generate_section(user_query, title, sections, tool_responses_text, mode, semaphore) for title in sections),
+            return_exceptions=True,
+        )
+        written = []
+        for title, result in zip(sections, results):
+            if isinstance(result, BaseException):
+                await self._record_thinked_thoughts(f"\nSection '{title}' failed: {result}. Leaving it out.", state)
+            else:
+                written.append((title, result))
+
+        if not written:
+            await self._record_thinked_thoughts("\nEvery section failed, so I will fall back to a single generation.", state)
+            try:
+                response = await self._llm_for("multi_step_thinking").ainvoke(await self._get_messages(
+                    f"User Query: {user_query}\n\nUsing the following sections, generate a well-structured response:\n\n"
+                    f"Sections: {', '.join(sections)}\n\nAdditional tool responses:\n{tool_responses_text}"
+                ))
+                return response.content, False
+            except Exception as e:
+                return f"Error: Unable to generate a response due to {str(e)}.", False
+
+        generated_response = assemble_sections(written)
+        await self._yield_status("✅ Response generation completed.", state)
+        await self._record_thinked_thoughts(f"\nAssembled {len(written)} of {len(sections)} sections. Generated Response:\n\n{generated_response}", state)
+        return generated_response, mode in self.SECTION_STYLES
+
+
     async def apply_explanation_mode(self, state: WorkFlowState) -> dict:
         base_response = state.get("generated_response", "No response available.")
         user_query = state.get("user_query", "No query provided.")
         mode = state.get("selected_mode", "Casual")
+
+        if state.get("mode_applied"):
+            await self._record_thinked_thoughts(f"\nThe sections were already written in {mode} mode, so I will keep the response as is.", state)
+            return {"refined_response": base_response}
         
         await self._yield_status(f"📝 Applying explanation mode: {mode}...", state)
         await self._record_thinked_thoughts(f"\nI need to modify the response based on the selected mode: {mode}.", state)
@@ -322,7 +531,7 @@ class ProxionWorkflow:
             await self._verbose_print(f"Re-invoking model for {mode} mode.", state)
 
             try:
-                response = await self.llm.ainvoke(await self._get_messages(explanation_prompts[mode]))
+                response = await self._llm_for("apply_explanation_mode").ainvoke(await self._get_messages(explanation_prompts[mode]))
                 modified_response = response.content
                 await self._yield_status(f"✅ {mode} transformation completed.", state)
                 await self._record_thinked_thoughts(f"\nMode ({mode}) applied successfully. Transformed Response:\n\n{modified_response}", state)
@@ -358,12 +567,24 @@ class ProxionWorkflow:
             "- `is_satisfactory` (bool): Indicates whether the response meets quality standards.\n"
             "- `feedback` (str): Provides detailed feedback on response quality and Markdown structure.\n"
         )
+        _, response_sections = split_sections(refined_response)
+        if response_sections:
+            evaluation_prompt += (
+                "- `section_verdicts` (list): One object per section below, each with `section` (the heading text), "
+                "`is_satisfactory` (bool) and `feedback` (str, what to fix in that section only). "
+                "Put problems that span the whole answer in the top-level `feedback`.\n"
+                f"Sections: {'; '.join(section['title'] for section in response_sections)}\n"
+            )
 
         try:
             
             await self._yield_status("🚀 Sending response for evaluation...", state)
 
-            evaluation = await self.evaluator.ainvoke(await self._get_messages(evaluation_prompt))
+            # The feedback is only used for refinement, so a satisfactory verdict ends the call.
+            evaluation = await self.evaluator.ainvoke(
+                await self._get_messages(evaluation_prompt),
+                ready=self._evaluation_is_final if self.stream_structured else None,
+            )
             
             if not hasattr(evaluation, "is_satisfactory") or not hasattr(evaluation, "feedback"):
                 raise ValueError("Invalid response format from evaluator.")
@@ -374,7 +595,8 @@ class ProxionWorkflow:
 
             return {
                 "is_satisfactory": evaluation.is_satisfactory,
-                "feedback": evaluation.feedback
+                "feedback": evaluation.feedback,
+                "section_verdicts": [verdict.model_dump() for verdict in getattr(evaluation, "section_verdicts", [])],
             }
         
         except Exception as e:
@@ -385,7 +607,8 @@ class ProxionWorkflow:
 
             return {
                 "is_satisfactory": False,
-                "feedback": error_message
+                "feedback": error_message,
+                "section_verdicts": [],
             }
 
 
@@ -404,6 +627,10 @@ class ProxionWorkflow:
         else:
             tool_responses_text = "**No additional tool responses available.**"
 
+        refined = await self._refine_sections(user_query, initial_response, state.get("section_verdicts", []), tool_responses_text, state)
+        if refined is not None:
+            return {"refined_response": refined}
+
         refinement_prompt = (
             f"User Query:\n{user_query}\n\n"
             f"Initial Response:\n{initial_response}\n\n"
@@ -439,6 +666,79 @@ class ProxionWorkflow:
             return {"refined_response": initial_response}
 
 
+    async def _refine_section(self, user_query: str, section : dict, feedback: str, tool_responses_text: str) -> str:
+        prompt = (
+            f"User Query:\n{user_query}\n\n"
+            f"Section \"{section['title']}\" of the answer:\n{section['body']}\n\n"
+            f"Feedback on this section:\n{feedback}\n\n"
+            f"Tool Responses:\n{tool_responses_text}\n\n"
+            f"Rewrite only the body of this section to address the feedback, without repeating its heading. "
+            f"Keep its tone, style and Markdown formatting, and do not introduce or conclude the whole answer."
+        )
+        response = await self.llm.ainvoke(await self._get_messages(prompt))
+        if not response.content.strip():
+            raise ValueError("Invalid or empty response from LLM.")
+        return strip_heading(response.content, section["title"])
+
+    @staticmethod
+    def _match_verdicts(sections: List[dict], verdicts: List[dict]):
+        """
+        Maps flagged verdicts to section indexes, `{index: feedback}`, or `None` if one names no section.
+        Repeated headings are matched in order; extra verdicts for the same section merge their feedback.
+        """
+        positions = {}
+        for index, section in enumerate(sections):
+            positions.setdefault(normalize_title(section["title"]), []).append(index)
+        targets = {}
+        for verdict in verdicts:
+            candidates = positions.get(normalize_title(verdict.get("section", "")))
+            if not candidates:
+                return None
+            index = next((candidate for candidate in candidates if candidate not in targets), candidates[-1])
+            feedback = verdict.get("feedback", "").strip()
+            targets[index] = "\n".join(part for part in (targets.get(index, ""), feedback) if part)
+        return targets
+
+    async def _refine_sections(self, user_query: str, response: str, verdicts: List[dict], tool_responses_text: str,
+                               state: WorkFlowState):
+        """
+        Rewrites only the sections the evaluator flagged and splices them back into the answer. Returns
+        `None` (full refinement) without verdicts, when a flagged section is not in the answer, or when
+        every section is flagged anyway.
+        """
+        flagged = [verdict for verdict in verdicts if not verdict.get("is_satisfactory", True)]
+        if not flagged:
+            return None
+        _, sections = split_sections(response)
+        targets = self._match_verdicts(sections, flagged)
+        if targets is None or len(targets) >= len(sections):
+            await self._record_thinked_thoughts("\nThe feedback does not map onto individual sections, so I will refine the whole response.", state)
+            return None
+
+        await self._yield_status(f"🩹 Refining {len(targets)} of {len(sections)} sections...", state)
+        await self._record_thinked_thoughts(f"\nOnly {', '.join(sections[index]['title'] for index in targets)} need work; I will rewrite just those.", state)
+
+        semaphore = asyncio.Semaphore(self.SECTION_CONCURRENCY)
+
+        async def refine(index, feedback):
+            async with semaphore:
+                return await self._refine_section(user_query, sections[index], feedback or state.get("feedback", ""), tool_responses_text)
+
+        results = await asyncio.gather(*(refine(index, feedback) for index, feedback in targets.items()), return_exceptions=True)
+        rewrites = {}
+        for index, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                await self._record_thinked_thoughts(f"\nRefining section '{sections[index]['title']}' failed: {result}. Keeping it as is.", state)
+            else:
+                rewrites[index] = result
+        if not rewrites:
+            return None
+
+        await self._yield_status("✅ Refinement completed!", state)
+        await self._record_thinked_thoughts("\nSection refinement completed. Evaluating improvements.", state)
+        return splice_sections(response, rewrites)
+
+
     async def final_response(self, state: WorkFlowState) -> dict:
         await self._verbose_print("Generating final response...", state)
         await self._yield_status("✅ Generating final response...", state)
@@ -450,32 +750,57 @@ class ProxionWorkflow:
             "tool_responses": state.get("tool_responses", {}),
             "is_thoughted": state.get("is_cosmology_related", False),
             "thinked_thoughts": self.thinked_thoughts,
+            "pipeline_profile": state["pipeline_profile"],
         }
         return {"final_response": final_response}
 
 
-    async def ainvoke(self, user_query: str, selected_mode: str = "Casual") -> str:
-        self.memory.add_user_message(user_query)
+    async def _run_workflow(self, user_query: str, selected_mode: str, consumer : object) -> dict:
+        estimate = self.complexity_estimator.estimate(user_query, selected_mode)
         initial_state = {
             "user_query": user_query, 
             "selected_mode": selected_mode,
-            "_consumer" : self.consumer,
+            "pipeline_profile": estimate.profile,
+            "_consumer" : consumer,
         }
-        start_time = time.time()
-
-        await self._verbose_print(f"Running with user query: {user_query} and selected mode: {selected_mode}", initial_state)
+        await self._verbose_print(f"Running with user query: {user_query}, selected mode: {selected_mode} and {estimate.profile} pipeline (complexity {estimate.score:.2f})", initial_state)
         self.thinked_thoughts = str()
         final_state = await self.workflow.ainvoke(initial_state)
+        return final_state["final_response"]
+
+    async def ainvoke(self, user_query: str, selected_mode: str = "Casual") -> str:
+        self.recalled_turns = await self._recall_turns(user_query)
+        depends_on_history = bool(self.memory.messages or self.recalled_turns)
+        await self.memory.aadd_user_message(user_query)
+        self.prompts.snapshot(self.memory.messages, self._recalled_messages())
+        start_time = time.time()
+
+        if self.single_flight is None or depends_on_history:
+            final_response = await self._run_workflow(user_query, selected_mode, self.consumer)
+        else:
+            # Without history the answer only depends on the query and mode, so identical
+            # concurrent requests can share one run.
+            final_response = await self.single_flight.run(
+                single_flight_key(user_query, selected_mode),
+                lambda consumer: self._run_workflow(user_query, selected_mode, consumer),
+                self.consumer,
+            )
+            final_response = {**final_response, "chat": str(self.chat.id)}
 
         end_time = time.time()
         time_taken = round(end_time - start_time, 2)
-        final_state["final_response"]["time_taken"] = time_taken
-        self.memory.add_ai_message(final_state["final_response"]["response"])
-        return final_state["final_response"]
+        final_response["time_taken"] = time_taken
+        await self.memory.aadd_ai_message(final_response["response"])
+        if self.recall is not None:
+            self.recall.add_turn(str(self.user.id), str(self.chat.id), user_query, final_response["response"])
+        return final_response
     
     @classmethod
     async def init_graph(cls, *args, **kwargs):
+        # `__init__` checks `knowledge_base.is_available`, which loads the index on first use.
+        await knowledge_base.aensure_loaded()
         graph = cls(*args, **kwargs)
+        graph.memory = await graph._build_memory()
         graph.workflow = await graph._build_workflow()
         return graph
         
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from langchain_core.runnables import Runnable
+from .metrics import metrics, percentile
+
+
+class NodeLatencyStats:
+    """Recent latencies and the hedge budget of a single graph node, shared by every workflow in the process."""
+
+    def __init__(self, window: int, max_hedge_ratio: float, burst: float):
+        self.latencies : Deque[float] = deque(maxlen=window)
+        self.max_hedge_ratio = max_hedge_ratio
+        self.burst = burst
+        self.tokens = burst
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        return percentile(ordered, q)
+
+    def earn(self):
+        """Every primary call earns `max_hedge_ratio` of a hedge, so hedges never exceed that share of the load."""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.max_hedge_ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_node_stats : Dict[str, NodeLatencyStats] = {}
+_node_stats_lock = threading.Lock()
+
+
+def get_node_stats(node: str, window: int = 200, max_hedge_ratio: float = 0.1, burst: float = 3.0) -> NodeLatencyStats:
+    with _node_stats_lock:
+        if node not in _node_stats:
+            _node_stats[node] = NodeLatencyStats(window, max_hedge_ratio, burst)
+        return _node_stats[node]
+
+
+class HedgedLLM:
+    """
+    Wraps a runnable so that a call slower than the node's recent latency percentile
+    gets a duplicate request; whichever finishes first wins and the other is cancelled.
+
+    Hedging only starts once `min_samples` latencies are known for the node, and the
+    number of duplicate requests is capped at `max_hedge_ratio` of the node's calls.
+    """
+
+    def __init__(self, runnable: Runnable, node: str, percentile: float = 0.95, min_samples: int = 20,
+                 min_delay: float = 0.5, max_hedge_ratio: float = 0.1, window: int = 200):
+        self.runnable = runnable
+        self.node = node
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.stats = get_node_stats(node, window=window, max_hedge_ratio=max_hedge_ratio)
+
+    def _hedge_delay(self) -> Optional[float]:
+        delay = self.stats.percentile(self.percentile, self.min_samples)
+        if delay is None:
+            return None
+        return max(delay, self.min_delay)
+
+    async def ainvoke(self, input: Any, config=None, **kwargs) -> Any:
+        metrics.incr(f"hedge.{self.node}.calls")
+        self.stats.earn()
+        delay = self._hedge_delay()
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self.runnable.ainvoke(input, config, **kwargs))
+        primary_finished = []
+        primary.add_done_callback(lambda _: primary_finished.append(time.perf_counter()))
+        tasks = {primary}
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if self.stats.spend():
+                        metrics.incr(f"hedge.{self.node}.issued")
+                        hedge = asyncio.ensure_future(self.runnable.ainvoke(input, config, **kwargs))
+                        tasks.add(hedge)
+                    else:
+                        metrics.incr(f"hedge.{self.node}.budget_exhausted")
+
+            winner = await self._first_successful(tasks)
+            if winner is not primary:
+                metrics.incr(f"hedge.{self.node}.wins")
+            return winner.result()
+        finally:
+            now = time.perf_counter()
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # The threshold learns from the primary request only; the latency of a hedged win would
+            # pull it down and make hedges ever more frequent. A primary cancelled after losing
+            # counts with the time it had run, a lower bound of its latency; a failed one not at all,
+            # as errors often return early and would drag the threshold down too.
+            if not primary.done() or primary.cancelled():
+                self.stats.record(now - start)
+            elif primary.exception() is None:
+                self.stats.record((primary_finished[0] if primary_finished else now) - start)
+            metrics.observe(f"hedge.{self.node}.latency", now - start)
+
+    async def _first_successful(self, tasks: set) -> asyncio.Future:
+        """Return the first task that completes without error; re-raise the last error if all of them fail."""
+        pending = set(tasks)
+        last_done = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                last_done = task
+                if not task.cancelled() and task.exception() is None:
+                    return task
+        return last_done
+
+    @staticmethod
+    def report(node: str) -> dict:
+        """Hedge rate and win rate of a node."""
+        return {
+            "calls": metrics.counter(f"hedge.{node}.calls"),
+            "hedge_rate": metrics.ratio(f"hedge.{node}.issued", f"hedge.{node}.calls"),
+            "win_rate": metrics.ratio(f"hedge.{node}.wins", f"hedge.{node}.issued"),
+        }
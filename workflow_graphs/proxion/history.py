@@ -0,0 +1,268 @@
+import os
+import json
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, Text, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from django.db.models import Q
+from chats_app.models import Chat, LLMResponse
+
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+HISTORY_TABLE_NAME = "chat_message_history"
+SUMMARY_TABLE_NAME = "chat_history_summary"
+
+metadata = MetaData()
+
+chat_message_history = Table(
+    HISTORY_TABLE_NAME,
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String(64), nullable=False),
+    Column("session_id", String(64), nullable=False),
+    Column("seq", Integer, nullable=False),
+    Column("message", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Index(
+        "chat_message_history_user_session_seq",
+        "user_id", "session_id", "seq",
+        unique=True,
+    ),
+)
+
+chat_history_summary = Table(
+    SUMMARY_TABLE_NAME,
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String(64), nullable=False),
+    Column("session_id", String(64), nullable=False),
+    Column("summary", Text, nullable=False),
+    Column("summarized_messages", Integer, nullable=True),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+    Index("chat_history_summary_user_session", "user_id", "session_id", unique=True),
+)
+
+_engines = {}
+_tables_ready = set()
+_tables_lock = asyncio.Lock()
+
+
+def to_async_url(url: str) -> str:
+    scheme, _, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def get_async_engine(url: str = None) -> AsyncEngine:
+    """
+    Returns the process-wide async engine of the memory database. Every history shares its
+    bounded pool (`MEMORY_DB_POOL_SIZE` connections plus `MEMORY_DB_MAX_OVERFLOW`).
+    """
+    url = to_async_url(url or os.getenv('MEMORY_DATABASE_URL'))
+    if url not in _engines:
+        engine_args = {}
+        if not url.startswith("sqlite"):
+            engine_args = {
+                "pool_size": int(os.getenv('MEMORY_DB_POOL_SIZE', 5)),
+                "max_overflow": int(os.getenv('MEMORY_DB_MAX_OVERFLOW', 5)),
+                "pool_pre_ping": True,
+            }
+        _engines[url] = create_async_engine(url, **engine_args)
+    return _engines[url]
+
+
+async def ensure_history_table(engine: AsyncEngine):
+    if engine.url in _tables_ready:
+        return
+    async with _tables_lock:
+        if engine.url not in _tables_ready:
+            async with engine.begin() as connection:
+                await connection.run_sync(metadata.create_all)
+            _tables_ready.add(engine.url)
+
+
+class ChatHistoryStore:
+    """The messages of one chat session, stored as ordered rows of the shared history table."""
+
+    def __init__(self, session_id: str, user_id: str, engine: AsyncEngine = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.engine = engine or get_async_engine()
+        self._next_seq : Optional[int] = None
+
+    def _where(self, statement):
+        return statement.where(
+            chat_message_history.c.user_id == self.user_id,
+            chat_message_history.c.session_id == self.session_id,
+        )
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        """Returns every stored message of the session in chronological order."""
+        await ensure_history_table(self.engine)
+        statement = self._where(select(chat_message_history.c.message)).order_by(chat_message_history.c.seq)
+        async with self.engine.connect() as connection:
+            rows = (await connection.execute(statement)).all()
+        return messages_from_dict([json.loads(row.message) for row in rows])
+
+    async def apages_newest_first(self, page_size: int = 50) -> AsyncIterator[List[BaseMessage]]:
+        """Yields pages of messages from the newest backwards, so callers can stop as soon as they have enough."""
+        await ensure_history_table(self.engine)
+        before_seq = None
+        while True:
+            statement = self._where(select(chat_message_history.c.seq, chat_message_history.c.message))
+            if before_seq is not None:
+                statement = statement.where(chat_message_history.c.seq < before_seq)
+            statement = statement.order_by(chat_message_history.c.seq.desc()).limit(page_size)
+            async with self.engine.connect() as connection:
+                rows = (await connection.execute(statement)).all()
+            if not rows:
+                return
+            yield messages_from_dict([json.loads(row.message) for row in rows])
+            if len(rows) < page_size:
+                return
+            before_seq = rows[-1].seq
+
+    async def _load_next_seq(self, connection) -> int:
+        statement = self._where(select(func.max(chat_message_history.c.seq)))
+        current = (await connection.execute(statement)).scalar()
+        return (current or 0) + 1
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage], attempts: int = 3):
+        """
+        Appends `messages` after the session's last sequence number. Another socket or worker writing
+        to the same session makes the insert collide on `seq`; the sequence is then re-read and the
+        insert retried, up to `attempts` times.
+        """
+        await ensure_history_table(self.engine)
+        payloads = [json.dumps(message_to_dict(message)) for message in messages]
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.engine.begin() as connection:
+                    if self._next_seq is None:
+                        self._next_seq = await self._load_next_seq(connection)
+                    now = datetime.now(timezone.utc)
+                    rows = [
+                        {
+                            "user_id": self.user_id,
+                            "session_id": self.session_id,
+                            "seq": self._next_seq + offset,
+                            "message": payload,
+                            "created_at": now,
+                        }
+                        for offset, payload in enumerate(payloads)
+                    ]
+                    await connection.execute(chat_message_history.insert(), rows)
+                self._next_seq += len(rows)
+                return
+            except IntegrityError:
+                self._next_seq = None
+                if attempt == attempts:
+                    raise
+            except Exception:
+                self._next_seq = None
+                raise
+
+    async def acount(self) -> int:
+        await ensure_history_table(self.engine)
+        async with self.engine.connect() as connection:
+            return (await connection.execute(self._where(select(func.count())))).scalar()
+
+    async def aget_summary(self) -> Tuple[str, Optional[int]]:
+        """The running summary and how many of the oldest messages it covers (`None` if unknown)."""
+        await ensure_history_table(self.engine)
+        statement = select(chat_history_summary.c.summary, chat_history_summary.c.summarized_messages).where(
+            chat_history_summary.c.user_id == self.user_id,
+            chat_history_summary.c.session_id == self.session_id,
+        )
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(statement)).first()
+        return (row.summary, row.summarized_messages) if row else ("", 0)
+
+    async def asave_summary(self, summary: str, summarized_messages: int):
+        await ensure_history_table(self.engine)
+        now = datetime.now(timezone.utc)
+        values = {"summary": summary, "summarized_messages": summarized_messages, "updated_at": now}
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                update(chat_history_summary)
+                .where(
+                    chat_history_summary.c.user_id == self.user_id,
+                    chat_history_summary.c.session_id == self.session_id,
+                )
+                .values(**values)
+            )
+            if result.rowcount == 0:
+                await connection.execute(chat_history_summary.insert().values(
+                    user_id=self.user_id, session_id=self.session_id, **values
+                ))
+
+
+class LLMResponseHistoryStore:
+    """
+    Derives a chat's history from its `LLMResponse` rows (prompt/response pairs by `created_at`).
+
+    The consumer already saves every turn as an `LLMResponse`, so this store writes nothing;
+    the running summary lives on the `Chat` row.
+    """
+
+    def __init__(self, session_id: str, user_id: str):
+        self.session_id = session_id
+        self.user_id = user_id
+
+    def _responses(self):
+        # `id` breaks ties between equal timestamps, so paging never skips or repeats a turn.
+        return LLMResponse.objects.filter(chat_id=self.session_id).order_by('-created_at', '-id')
+
+    @staticmethod
+    def _pair(prompt: str, response: str) -> List[BaseMessage]:
+        return [HumanMessage(content=prompt), AIMessage(content=response)]
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        messages = []
+        async for prompt, response in self._responses().reverse().values_list('prompt', 'response'):
+            messages.extend(self._pair(prompt, response))
+        return messages
+
+    async def apages_newest_first(self, page_size: int = 50) -> AsyncIterator[List[BaseMessage]]:
+        before = None
+        while True:
+            responses = self._responses()
+            if before is not None:
+                created_at, response_id = before
+                responses = responses.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=response_id))
+            rows = [row async for row in responses.values_list('prompt', 'response', 'created_at', 'id')[:page_size]]
+            if not rows:
+                return
+            yield [message for prompt, response, _, _ in rows for message in reversed(self._pair(prompt, response))]
+            if len(rows) < page_size:
+                return
+            before = rows[-1][2:]
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]):
+        """Turns are persisted as `LLMResponse` rows by the consumer."""
+
+    async def acount(self) -> int:
+        return 2 * await self._responses().acount()
+
+    async def aget_summary(self) -> Tuple[str, Optional[int]]:
+        row = await Chat.objects.filter(id=self.session_id).values_list('memory_summary', 'memory_summarized_messages').afirst()
+        if not row or not row[0]:
+            return "", 0
+        return row[0], row[1]
+
+    async def asave_summary(self, summary: str, summarized_messages: int):
+        await Chat.objects.filter(id=self.session_id).aupdate(memory_summary=summary, memory_summarized_messages=summarized_messages)
+
+
+def get_history_store(session_id: str, user_id: str):
+    """The history store selected by `MEMORY_BACKEND`: 'sql' (the shared history table) or 'llm_responses'."""
+    if os.getenv('MEMORY_BACKEND', 'sql') == 'llm_responses':
+        return LLMResponseHistoryStore(session_id, user_id)
+    return ChatHistoryStore(session_id, user_id)
@@ -0,0 +1,167 @@
+import os
+import json
+import asyncio
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Iterable, Iterator, List, Optional
+import faiss
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .embeddings import embed_query, embed_texts, get_embeddings
+from .metrics import metrics
+
+
+INDEX_FILE = "index.faiss"
+PASSAGES_FILE = "passages.jsonl"
+
+logger = logging.getLogger(__name__)
+
+
+def read_corpus(path: str) -> Iterator[dict]:
+    """
+    Yields `{"title", "text"}` documents from a `.jsonl` export (one article per line) or
+    from a directory of `.md`/`.txt` files, titled by file name.
+    """
+    if os.path.isfile(path):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    article = json.loads(line)
+                    yield {"title": article.get("title", ""), "text": article["text"]}
+        return
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.endswith((".md", ".txt")):
+                with open(os.path.join(root, name), encoding="utf-8") as file:
+                    yield {"title": os.path.splitext(name)[0].replace("_", " "), "text": file.read()}
+
+
+def passage_id(title: str, text: str) -> str:
+    return hashlib.sha1(f"{title}\n{text}".encode("utf-8")).hexdigest()
+
+
+class CosmologyKnowledgeBase:
+    """
+    A pre-built corpus of astronomy and cosmology passages in a FAISS inner-product index.
+
+    At runtime the index is memory-mapped read-only, so workers share its pages through the OS
+    page cache; it is built and updated offline with the `build_cosmology_kb` command.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index : Optional[faiss.Index] = None
+        self.passages : List[dict] = []
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._load_attempted = False
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    @property
+    def passages_path(self) -> str:
+        return os.path.join(self.directory, PASSAGES_FILE)
+
+    @property
+    def is_available(self) -> bool:
+        return self.ensure_loaded() and self.index.ntotal > 0
+
+    def _read_passages(self) -> List[dict]:
+        with open(self.passages_path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def load(self, warm_up: bool = True) -> bool:
+        """Memory-maps the index if one has been built; optionally loads the embedding model in the background."""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.passages_path)):
+            return False
+        with self._lock:
+            self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self.passages = self._read_passages()
+        if warm_up:
+            threading.Thread(target=get_embeddings, name="knowledge-base-warm-up", daemon=True).start()
+        return True
+
+    def ensure_loaded(self) -> bool:
+        """Loads the index on first use, once per process, so only processes that answer queries pay for it."""
+        if not self._load_attempted:
+            with self._load_lock:
+                if not self._load_attempted:
+                    try:
+                        if not self.load():
+                            logger.info("No cosmology knowledge base found in %s.", self.directory)
+                    except Exception:
+                        logger.exception("Failed to load the cosmology knowledge base from %s.", self.directory)
+                    self._load_attempted = True
+        return self.index is not None
+
+    async def aensure_loaded(self) -> bool:
+        """`ensure_loaded` off the event loop; reading the index and passages would stall every socket of the worker."""
+        if self._load_attempted:
+            return self.index is not None
+        return await asyncio.to_thread(self.ensure_loaded)
+
+    def search(self, query: str, k: int = 4, min_score: float = 0.3) -> List[dict]:
+        if not self.is_available:
+            return []
+        started = time.perf_counter()
+        scores, ids = self.index.search(embed_query(query), k)
+        metrics.observe("knowledge_base.search_seconds", time.perf_counter() - started)
+        return [
+            {**self.passages[passage], "score": float(score)}
+            for score, passage in zip(scores[0], ids[0])
+            if passage != -1 and score >= min_score
+        ]
+
+    def build(self, documents: Iterable[dict], update: bool = False, chunk_size: int = 800, chunk_overlap: int = 100,
+              batch_size: int = 256) -> int:
+        """Chunks, embeds and indexes documents; with `update`, appends only passages not indexed yet. Returns the number added."""
+        os.makedirs(self.directory, exist_ok=True)
+        index, passages = None, []
+        if update and os.path.exists(self.index_path) and os.path.exists(self.passages_path):
+            index, passages = faiss.read_index(self.index_path), self._read_passages()
+        known = {passage["id"] for passage in passages}
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        new_passages = []
+        for document in documents:
+            for chunk in splitter.split_text(document["text"]):
+                identifier = passage_id(document["title"], chunk)
+                if identifier not in known:
+                    known.add(identifier)
+                    new_passages.append({"id": identifier, "title": document["title"], "text": chunk})
+
+        for start in range(0, len(new_passages), batch_size):
+            vectors = embed_texts([f"{p['title']}\n{p['text']}" for p in new_passages[start:start + batch_size]])
+            if index is None:
+                index = faiss.IndexFlatIP(vectors.shape[1])
+            index.add(vectors)
+
+        if index is not None:
+            # Running workers memory-map the index, so never rewrite it in place: write both files
+            # beside it and swap them in, passages first so the index never points past them.
+            passages_tmp = self._temp_path(PASSAGES_FILE)
+            index_tmp = self._temp_path(INDEX_FILE)
+            try:
+                with open(passages_tmp, "w", encoding="utf-8") as file:
+                    for passage in passages + new_passages:
+                        file.write(json.dumps(passage) + "\n")
+                faiss.write_index(index, index_tmp)
+                os.replace(passages_tmp, self.passages_path)
+                os.replace(index_tmp, self.index_path)
+            finally:
+                for path in (passages_tmp, index_tmp):
+                    if os.path.exists(path):
+                        os.remove(path)
+        return len(new_passages)
+
+    def _temp_path(self, name: str) -> str:
+        descriptor, path = tempfile.mkstemp(prefix=f".{name}.", dir=self.directory)
+        os.close(descriptor)
+        return path
+
+
+knowledge_base = CosmologyKnowledgeBase(os.getenv('KNOWLEDGE_BASE_DIR', 'knowledge_base'))
@@ -1,43 +1,201 @@
-import os
+import asyncio
+import logging
+from collections import deque
 from datetime import datetime
-from langchain_core.messages import trim_messages
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_community.chat_message_histories import SQLChatMessageHistory
-from langchain_core.chat_history import BaseChatMessageHistory
+from typing import Deque, List, Optional, Tuple
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from .history import ChatHistoryStore, get_history_store
+from .tokens import LlamaTokenCounter, get_token_counter
+
+
+logger = logging.getLogger(__name__)
+
 
 class Memory:
-    def __init__(self, sql_history_obj : SQLChatMessageHistory,  max_tokens: int, token_counter, include_system: bool, allow_partial: bool, start_on: str):
-        self.trim_messages = trim_messages(
-            max_tokens=max_tokens,
-            strategy='last',
-            token_counter=token_counter,
-            include_system=include_system,
-            allow_partial=allow_partial,
-            start_on=start_on
-        )
-        self.sql_history_obj = sql_history_obj
-        self.messages = self.get_trimmed_messages()
-    
-    def get_trimmed_messages(self):
-        return self.trim_messages.invoke(self.sql_history_obj.messages)
-        
+    """
+    A token-bounded window over a chat history. The history is read once; new messages are
+    persisted and appended in memory. Once the window exceeds `max_tokens`, the oldest messages are
+    evicted in one block down to `trim_ratio` of the budget, so the window's head (and with it the
+    prompt prefix providers cache) stays unchanged for several turns instead of shifting every turn.
+    """
+
+    def __init__(self, history_store : ChatHistoryStore, max_tokens: int, token_counter : LlamaTokenCounter = None, start_on: str = 'human',
+                 trim_ratio: float = 0.5):
+        self.history_store = history_store
+        self.max_tokens = max_tokens
+        self.trim_ratio = trim_ratio
+        self.token_counter = token_counter or get_token_counter()
+        self.start_on = start_on
+        self.window : Deque[BaseMessage] = deque()
+        self.token_counts : Deque[int] = deque()
+        self.total_tokens = 0
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return list(self.window)
+
+    def _evict(self) -> List[Tuple[BaseMessage, int]]:
+        evicted = []
+        limit = self.max_tokens if self.total_tokens <= self.max_tokens else int(self.max_tokens * self.trim_ratio)
+        while self.window and (self.total_tokens > limit or self.window[0].type != self.start_on):
+            evicted.append((self.window.popleft(), self.token_counts.popleft()))
+            self.total_tokens -= evicted[-1][1]
+        return evicted
+
+    def _on_evicted(self, evicted: List[Tuple[BaseMessage, int]]):
+        """Called with the `(message, tokens)` pairs pushed out of the window by a new message."""
+
+    def _append(self, message: BaseMessage):
+        tokens = self.token_counter.count_message(message)
+        self.window.append(message)
+        self.token_counts.append(tokens)
+        self.total_tokens += tokens
+        evicted = self._evict()
+        if evicted:
+            self._on_evicted(evicted)
+
+    async def aload(self):
+        """Fills the window from the newest stored messages backwards, counting only what fits."""
+        self.window.clear()
+        self.token_counts.clear()
+        self.total_tokens = 0
+        async for page in self.history_store.apages_newest_first():
+            for message, tokens in zip(page, self.token_counter.count_messages(page)):
+                if self.total_tokens + tokens > self.max_tokens:
+                    self._evict()
+                    return
+                self.window.appendleft(message)
+                self.token_counts.appendleft(tokens)
+                self.total_tokens += tokens
+        self._evict()
+
     def get_timestamp(self):
-        return datetime.now().strftime("%A, %B %d, %Y - %I:%M %p")
-
-    def add_user_message(self, message: str):
-        timestamp = self.get_timestamp()
-        message_with_time = f"{message} \n @{timestamp}"
-        self.sql_history_obj.add_user_message(HumanMessage(content=message_with_time))
-        self.messages = self.get_trimmed_messages()
-
-    def add_ai_message(self, message: str):
-        timestamp = self.get_timestamp()
-        message_with_time = f"{message} \n @{timestamp}"
-        self.sql_history_obj.add_ai_message(AIMessage(content=message_with_time))
-        self.messages = self.get_trimmed_messages()
-                
+        return datetime.now().isoformat(timespec="seconds")
+
+    async def aadd_message(self, message: BaseMessage):
+        await self.history_store.aadd_messages([message])
+        self._append(message)
+
+    async def aadd_user_message(self, message: str):
+        # The timestamp is kept out of the content so that stored history stays byte-stable for prompt caching.
+        await self.aadd_message(HumanMessage(content=message, additional_kwargs={"timestamp": self.get_timestamp()}))
+
+    async def aadd_ai_message(self, message: str):
+        await self.aadd_message(AIMessage(content=message, additional_kwargs={"timestamp": self.get_timestamp()}))
+
+    async def aclose(self):
+        """Finishes any pending background work before the memory is discarded."""
+
     @classmethod
-    def get_memory(cls, session_id:str, user_id:str, max_tokens: int, token_counter, include_system: bool, allow_partial: bool, start_on: str) -> BaseChatMessageHistory:
-        message_history = SQLChatMessageHistory(session_id=session_id, connection_string=os.getenv('MEMORY_DATABASE_URL'), table_name = user_id)
-        message_history_trimmed = cls(message_history, max_tokens, token_counter, include_system, allow_partial, start_on) if len(message_history.messages) > 0 else message_history
-        return message_history_trimmed
\ No newline at end of file
+    async def aget_memory(cls, session_id:str, user_id:str, max_tokens: int, token_counter : LlamaTokenCounter = None, start_on: str = 'human', **kwargs) -> "Memory":
+        memory = cls(get_history_store(session_id, user_id), max_tokens, token_counter, start_on, **kwargs)
+        await memory.aload()
+        return memory
+
+
+class SummarizingMemory(Memory):
+    """
+    A window memory that folds evicted turns into a running summary instead of dropping them.
+
+    `summary_share` of the token budget is reserved for the summary and the rest holds recent
+    turns. Summaries are updated by a background task once `min_pending_tokens` worth of turns
+    has been evicted, so the request path never waits on the summarizer.
+    """
+
+    def __init__(self, history_store : ChatHistoryStore, max_tokens: int, token_counter : LlamaTokenCounter = None, start_on: str = 'human',
+                 llm : BaseChatModel = None, summary_share: float = 0.25, min_pending_tokens: int = 256, max_backlog_tokens: int = None,
+                 trim_ratio: float = 0.5):
+        self.summary_max_tokens = int(max_tokens * summary_share)
+        super().__init__(history_store, max_tokens - self.summary_max_tokens, token_counter, start_on, trim_ratio)
+        self.llm = llm
+        self.min_pending_tokens = min_pending_tokens
+        self.max_backlog_tokens = max_backlog_tokens or max_tokens
+        self.summary = ""
+        self.summarized_messages = 0
+        self.pending : List[Tuple[BaseMessage, int]] = []
+        self._summary_task : Optional[asyncio.Task] = None
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        if not self.summary:
+            return list(self.window)
+        return [SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"), *self.window]
+
+    async def aload(self):
+        """
+        Fills the window like `Memory.aload`, then queues the older messages the stored summary does
+        not cover yet (the newest `max_backlog_tokens` of them) to be folded into it.
+        """
+        self.summary, covered = await self.history_store.aget_summary()
+        position = await self.history_store.acount()
+        self.window.clear()
+        self.token_counts.clear()
+        self.total_tokens = 0
+        backlog : List[Tuple[BaseMessage, int]] = []
+        backlog_tokens = 0
+        window_full = False
+        async for page in self.history_store.apages_newest_first():
+            for message, tokens in zip(page, self.token_counter.count_messages(page)):
+                position -= 1
+                if not window_full and self.total_tokens + tokens <= self.max_tokens:
+                    self.window.appendleft(message)
+                    self.token_counts.appendleft(tokens)
+                    self.total_tokens += tokens
+                    continue
+                window_full = True
+                # A summary of unknown coverage predates this bookkeeping and covers everything before the window.
+                if covered is None or position < covered or backlog_tokens + tokens > self.max_backlog_tokens:
+                    position += 1
+                    break
+                backlog.append((message, tokens))
+                backlog_tokens += tokens
+            else:
+                continue
+            break
+
+        self.pending = backlog[::-1] + self._evict()
+        self.summarized_messages = max(position, 0)
+        if self._pending_tokens() >= self.min_pending_tokens:
+            self._schedule_summary()
+
+    def _pending_tokens(self) -> int:
+        return sum(tokens for _, tokens in self.pending)
+
+    def _on_evicted(self, evicted: List[Tuple[BaseMessage, int]]):
+        self.pending.extend(evicted)
+        if self._pending_tokens() >= self.min_pending_tokens:
+            self._schedule_summary()
+
+    def _schedule_summary(self):
+        if self._summary_task is None or self._summary_task.done():
+            self._summary_task = asyncio.create_task(self._update_summary())
+
+    def _summary_prompt(self, turns: List[BaseMessage]) -> str:
+        transcript = "\n\n".join(f"{'User' if message.type == 'human' else 'Proxion'}: {message.content}" for message in turns)
+        return (
+            "Update the running summary of a conversation between a user and Proxion, a cosmology assistant.\n"
+            f"Keep it under {self.summary_max_tokens} tokens. Keep facts, numbers, the user's interests and open questions; drop pleasantries.\n\n"
+            f"Current summary:\n{self.summary or 'None yet.'}\n\n"
+            f"Turns to fold in:\n{transcript}\n\n"
+            "Respond with the updated summary only."
+        )
+
+    async def _update_summary(self, force: bool = False):
+        while self.pending and (force or self._pending_tokens() >= self.min_pending_tokens):
+            batch, self.pending = self.pending, []
+            try:
+                response = await self.llm.ainvoke(self._summary_prompt([message for message, _ in batch]))
+                summary = response.content.strip()
+                await self.history_store.asave_summary(summary, self.summarized_messages + len(batch))
+                self.summary = summary
+                self.summarized_messages += len(batch)
+            except Exception:
+                self.pending = batch + self.pending
+                logger.exception("Memory summary update failed for session %s", self.history_store.session_id)
+                return
+
+    async def aclose(self):
+        if self._summary_task is not None and not self._summary_task.done():
+            await self._summary_task
+        await self._update_summary(force=True)
@@ -0,0 +1,64 @@
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, Sequence
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """The `q` quantile of an ascending, non-empty sequence (nearest rank, rounding down)."""
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class Metrics:
+    """A small process-wide registry of counters and recent observations for the Proxion workflow."""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters : Dict[str, float] = defaultdict(float)
+        self._observations : Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self._window))
+
+    def incr(self, name: str, value: float = 1):
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        """Record an observation (e.g. a latency in seconds) in a bounded window."""
+        with self._lock:
+            self._observations[name].append(value)
+
+    def counter(self, name: str) -> float:
+        """Return the current value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """Return the ratio of two counters, or 0 when the denominator is empty."""
+        with self._lock:
+            total = self._counters.get(denominator, 0)
+            return self._counters.get(numerator, 0) / total if total else 0.0
+
+    def snapshot(self) -> dict:
+        """Return a copy of all counters and a summary of every observation window."""
+        with self._lock:
+            observations = {}
+            for name, values in self._observations.items():
+                ordered = sorted(values)
+                if not ordered:
+                    continue
+                observations[name] = {
+                    "count": len(ordered),
+                    "p50": percentile(ordered, 0.50),
+                    "p95": percentile(ordered, 0.95),
+                    "max": ordered[-1],
+                }
+            return {"counters": dict(self._counters), "observations": observations}
+
+    def reset(self):
+        """Clear every counter and observation."""
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+metrics = Metrics()
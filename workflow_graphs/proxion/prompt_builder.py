@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Sequence
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from .metrics import metrics
+from .prompts import PROXION_SYSTEM_MESSAGE
+from .tokens import LlamaTokenCounter
+
+
+class PromptAssembler:
+    """
+    Builds every node prompt of a request as one byte-identical prefix (system message, history,
+    then request-specific context) followed by the node's instruction, so provider-side prompt
+    caches can reuse the prefix across nodes. Across turns the history grows at its end and is
+    only trimmed at its head in occasional large blocks (see `Memory`), so the prefix is reused
+    between trims; the turn after a trim (or a summary update) starts a new cached prefix.
+    """
+
+    def __init__(self, token_counter : LlamaTokenCounter):
+        self.token_counter = token_counter
+        self.prefix : List[BaseMessage] = [SystemMessage(content=PROXION_SYSTEM_MESSAGE)]
+        self.previous : List[BaseMessage] = []
+
+    def snapshot(self, history: Sequence[BaseMessage], context: Sequence[BaseMessage] = ()):
+        """Freezes the prefix for the current request; background memory updates only show up on the next one."""
+        self.prefix = [SystemMessage(content=PROXION_SYSTEM_MESSAGE), *history, *context]
+
+    def build(self, instruction: str) -> List[BaseMessage]:
+        current_time = datetime.now().strftime("%A, %B %d, %Y - %I:%M %p")
+        messages = [*self.prefix, HumanMessage(content=f"{instruction}\n\n(Current time: {current_time})")]
+        self._report(messages)
+        self.previous = messages
+        return messages
+
+    def _shared_prefix_length(self, messages: List[BaseMessage]) -> int:
+        shared = 0
+        for current, previous in zip(messages, self.previous):
+            if current.type != previous.type or current.content != previous.content:
+                break
+            shared += 1
+        return shared
+
+    def _report(self, messages: List[BaseMessage]):
+        counts = self.token_counter.count_messages(messages)
+        total, reused = sum(counts), sum(counts[:self._shared_prefix_length(messages)])
+        metrics.incr("prompt.tokens", total)
+        metrics.incr("prompt.prefix_reused_tokens", reused)
+        metrics.observe("prompt.size", total)
+        metrics.observe("prompt.prefix_reuse", reused / total if total else 0.0)
+
+    @staticmethod
+    def reuse_ratio() -> float:
+        """Share of all prompt tokens sent so far that repeated the previous prompt's prefix."""
+        return metrics.ratio("prompt.prefix_reused_tokens", "prompt.tokens")
@@ -0,0 +1,209 @@
+import os
+import json
+import asyncio
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+import faiss
+from filelock import FileLock
+import numpy as np
+from .embeddings import aembed_query, aembed_texts, executor
+from .metrics import metrics
+from .tokens import LlamaTokenCounter, get_token_counter
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserRecallIndex:
+    """
+    A user's past turns in an inner-product FAISS index, with the turn texts kept alongside by id.
+
+    Every worker shares the files: changes are applied under a file lock to the latest version on
+    disk and swapped in with `os.replace`, and readers pick up other workers' writes on `refresh`.
+    """
+
+    def __init__(self, user_id: str, directory: str):
+        self.user_id = user_id
+        self.directory = directory
+        self.index_path = os.path.join(directory, f"{user_id}.faiss")
+        self.turns_path = os.path.join(directory, f"{user_id}.json")
+        self.index : Optional[faiss.IndexIDMap2] = None
+        self.turns : Dict[int, dict] = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+        self.file_lock = FileLock(os.path.join(directory, f"{user_id}.lock"))
+        self._version : Optional[tuple] = None
+        self.refresh()
+
+    def _disk_version(self) -> Optional[tuple]:
+        # Every write replaces the turns file last, so its inode and mtime identify the version on disk.
+        try:
+            stat = os.stat(self.turns_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _reload(self):
+        """Re-reads the files if another worker replaced them; the caller holds both locks."""
+        version = self._disk_version()
+        if version == self._version:
+            return
+        if version is None:
+            self.index, self.turns, self.next_id = None, {}, 1
+        else:
+            self.index = faiss.read_index(self.index_path)
+            with open(self.turns_path) as file:
+                self.turns = {int(turn_id): turn for turn_id, turn in json.load(file).items()}
+            self.next_id = max(self.turns, default=0) + 1
+        self._version = version
+
+    def _write(self):
+        for path, write in (
+            (self.index_path, lambda temp: faiss.write_index(self.index, temp)),
+            (self.turns_path, lambda temp: _write_json(temp, self.turns)),
+        ):
+            temp = f"{path}.{os.getpid()}.tmp"
+            write(temp)
+            os.replace(temp, path)
+        self._version = self._disk_version()
+
+    def refresh(self):
+        """Picks up turns that other workers added or removed since this index was read."""
+        if self._disk_version() != self._version:
+            with self.lock, self.file_lock:
+                self._reload()
+
+    def add(self, vectors: np.ndarray, turns: List[dict]):
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock, self.file_lock:
+            self._reload()
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            ids = np.arange(self.next_id, self.next_id + len(turns), dtype="int64")
+            self.index.add_with_ids(vectors, ids)
+            for turn_id, turn in zip(ids.tolist(), turns):
+                self.turns[turn_id] = turn
+            self.next_id += len(turns)
+            self._write()
+
+    def remove_session(self, session_id: str) -> int:
+        if self._disk_version() is None and self.index is None:
+            return 0
+        with self.lock, self.file_lock:
+            self._reload()
+            ids = [turn_id for turn_id, turn in self.turns.items() if turn["session_id"] == session_id]
+            if ids and self.index is not None:
+                self.index.remove_ids(np.asarray(ids, dtype="int64"))
+            for turn_id in ids:
+                del self.turns[turn_id]
+            if ids:
+                self._write()
+            return len(ids)
+
+    def search(self, vector: np.ndarray, k: int) -> List[tuple]:
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            scores, ids = self.index.search(vector, min(k, self.index.ntotal))
+            return [(float(score), self.turns[int(turn_id)]) for score, turn_id in zip(scores[0], ids[0]) if turn_id != -1]
+
+
+def _write_json(path: str, data: dict):
+    with open(path, "w") as file:
+        json.dump(data, file)
+
+
+class RecallService:
+    """
+    Long-term semantic recall over a user's past turns, across all of their chats.
+
+    New turns are queued and embedded in batches by a background task; indexes are kept in a
+    bounded in-memory LRU and persisted under `RECALL_INDEX_DIR`.
+    """
+
+    def __init__(self, directory: str = None, max_cached_users: int = 256, batch_delay: float = 0.5,
+                 token_counter : LlamaTokenCounter = None):
+        self.directory = directory or os.getenv('RECALL_INDEX_DIR', 'recall_indexes')
+        self.max_cached_users = max_cached_users
+        self.batch_delay = batch_delay
+        self.token_counter = token_counter or get_token_counter()
+        self._indexes : "OrderedDict[str, UserRecallIndex]" = OrderedDict()
+        self._indexes_lock = threading.Lock()
+        self._pending : List[dict] = []
+        self._flush_task : Optional[asyncio.Task] = None
+
+    def get_index(self, user_id: str) -> UserRecallIndex:
+        with self._indexes_lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+        if index is not None:
+            index.refresh()
+            return index
+        index = UserRecallIndex(user_id, self.directory)
+        with self._indexes_lock:
+            index = self._indexes.setdefault(user_id, index)
+            while len(self._indexes) > self.max_cached_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def add_turn(self, user_id: str, session_id: str, human: str, ai: str):
+        """Queues a turn for embedding without waiting for it."""
+        self._pending.append({"user_id": user_id, "session_id": session_id, "human": human, "ai": ai})
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        await asyncio.sleep(self.batch_delay)
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                vectors = await aembed_texts([f"{turn['human']}\n{turn['ai']}" for turn in batch])
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(executor, self._index_batch, batch, vectors)
+                metrics.incr("recall.turns_indexed", len(batch))
+            except Exception:
+                metrics.incr("recall.index_failures")
+                logger.exception("Recall indexing failed for %d turns", len(batch))
+
+    def _index_batch(self, batch: List[dict], vectors: np.ndarray):
+        by_user : Dict[str, List[int]] = {}
+        for position, turn in enumerate(batch):
+            by_user.setdefault(turn["user_id"], []).append(position)
+        for user_id, positions in by_user.items():
+            index = self.get_index(user_id)
+            index.add(vectors[positions], [
+                {"session_id": batch[p]["session_id"], "human": batch[p]["human"], "ai": batch[p]["ai"]}
+                for p in positions
+            ])
+
+    def remove_session(self, user_id: str, session_id: str) -> int:
+        """Drops every turn of a chat from the user's index."""
+        return self.get_index(user_id).remove_session(session_id)
+
+    async def arecall(self, user_id: str, query: str, token_budget: int, k: int = 5, min_score: float = 0.35,
+                      exclude: Set[str] = frozenset()) -> List[dict]:
+        """The most relevant past turns for `query` that fit in `token_budget`, skipping turns whose question is in `exclude`."""
+        index = await asyncio.get_running_loop().run_in_executor(executor, self.get_index, user_id)
+        if index.index is None:
+            return []
+        vector = await aembed_query(query)
+        recalled, used = [], 0
+        for score, turn in index.search(vector, k + len(exclude)):
+            if score < min_score or turn["human"] in exclude:
+                continue
+            tokens = self.token_counter.count_text(f"{turn['human']}\n{turn['ai']}")
+            if used + tokens > token_budget:
+                continue
+            recalled.append(turn)
+            used += tokens
+            if len(recalled) == k:
+                break
+        metrics.incr("recall.queries")
+        metrics.incr("recall.turns_recalled", len(recalled))
+        return recalled
+
+
+recall_service = RecallService()
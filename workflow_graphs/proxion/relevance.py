@@ -0,0 +1,60 @@
+import re
+import math
+from collections import Counter
+from typing import Callable, List, Sequence
+from ai.extractive import content_words
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory collection, e.g. the chunks or sentences of a single tool response."""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = [Counter(content_words(document)) for document in documents]
+        self.lengths = [sum(document.values()) for document in self.documents]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        frequency = Counter(word for document in self.documents for word in document)
+        total = len(self.documents)
+        self.idf = {word: math.log(1 + (total - count + 0.5) / (count + 0.5)) for word, count in frequency.items()}
+
+    def scores(self, query: str) -> List[float]:
+        query_words = Counter(content_words(query))
+        scores = []
+        for document, length in zip(self.documents, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            scores.append(sum(
+                weight * self.idf[word] * document[word] * (self.k1 + 1) / (document[word] + norm)
+                for word, weight in query_words.items() if word in document
+            ))
+        return scores
+
+
+def select_within_budget(texts: Sequence[str], scores: Sequence[float], token_budget: int,
+                         count_tokens: Callable[[str], int]) -> List[int]:
+    """
+    Greedily picks the best-scoring texts that fit in `token_budget` and returns their indices in
+    original order; ties (including an all-zero ranking) keep the earlier text.
+    """
+    selected, used = [], 0
+    for index in sorted(range(len(texts)), key=lambda i: (-scores[i], i)):
+        tokens = count_tokens(texts[index])
+        if used + tokens <= token_budget:
+            selected.append(index)
+            used += tokens
+    return sorted(selected)
+
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])|\n+")
+
+
+def split_sentences_lossless(text: str) -> List[str]:
+    """
+    Splits at sentence ends and line breaks, keeping every non-empty piece (headings, short lines and
+    questions included), unlike `ai.extractive.split_sentences`, which keeps only candidate key points.
+    """
+    return [sentence for sentence in (" ".join(piece.split()) for piece in _SENTENCE_BOUNDARY.split(text)) if sentence]
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
@@ -0,0 +1,149 @@
+import re
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from ai.extractive import STOPWORDS, tokenize
+from .embeddings import aembed_query, aembed_texts
+from .metrics import metrics
+
+
+URL = re.compile(r"https?://[^\s<>\"')\]]+")
+NUMBER = r"\d+(?:\.\d+)?(?:e[-+]?\d+)?"
+EXPRESSION = re.compile(rf"(?<![\w.])\(*\s*{NUMBER}(?:\s*\)*\s*[-+*/^%]\s*\(*\s*{NUMBER})+\s*\)*", re.I)
+REDSHIFT = re.compile(rf"\b(?:z\s*(?:=|~|≈)|redshift(?:\s+of)?)\s*({NUMBER})", re.I)
+COSMOLOGY_QUANTITIES = [
+    (re.compile(r"\blookback\b", re.I), "lookback_time"),
+    (re.compile(r"\bage\b|\bhow old\b", re.I), "age"),
+    (re.compile(r"\bluminosity distance\b", re.I), "luminosity_distance"),
+    (re.compile(r"\bangular[- ]diameter distance\b", re.I), "angular_diameter_distance"),
+    (re.compile(r"\bhubble (?:parameter|rate|constant)\b|\bexpansion rate\b", re.I), "hubble"),
+    (re.compile(r"\bhow far\b|\bdistance\b", re.I), "comoving_distance"),
+]
+DATE_LIKE = re.compile(r"^\d{4}-\d{1,2}(-\d{1,2})?$|^\d{4}-\d{4}$")
+# Arithmetic counts only with an explicit cue, or when every operator is spaced like "3 * 4 + 2".
+MATH_CUE = re.compile(r"\b(?:calculate|compute|evaluate|solve)\b", re.I)
+ASKED_VALUE = re.compile(r"\b(?:what\s+is|what's|how\s+much\s+is)\s*$", re.I)
+TIGHT_OPERATOR = re.compile(r"[N)][-+*/^%]|[-+*/^%][N(]")
+RANGE = re.compile(rf"^{NUMBER}\s*[-–]\s*{NUMBER}$", re.I)
+RECENCY = re.compile(r"\b(latest|recent(ly)?|today|this (week|month|year)|news|currently|upcoming|just (launched|announced)|20[2-9]\d)\b", re.I)
+GENERIC_SECTIONS = re.compile(
+    r"^(introduction|overview|summary|conclusions?|background|references|further reading|faqs?"
+    r"|.*\b(views?|perspectives?|interpretations?|implications|thoughts|reflections?))$", re.I
+)
+
+TOOL_PROTOTYPES : Dict[str, List[str]] = {
+    "DuckDuckGo": [
+        "latest news about a space mission",
+        "a discovery announced this week",
+        "current status of a telescope or rocket launch",
+        "what did NASA or ESA announce recently",
+    ],
+    "Reference": [
+        "definition and history of a cosmology concept",
+        "physical properties of a planet, star or galaxy",
+        "how does this astrophysical process work",
+        "biography and contributions of an astronomer",
+    ],
+}
+
+
+class ToolRouter:
+    """
+    Picks tool calls locally instead of asking the tool-calling model: rules for URLs (Web URL),
+    arithmetic and redshift questions (Calculator) and recency (DuckDuckGo), then embedding similarity against a few
+    prototype questions per tool, with one reference lookup (knowledge base, else Wikipedia) per
+    relevant section. Returns `None` when nothing is confident enough, so the caller can fall back
+    to the LLM router.
+    """
+
+    _prototype_vectors : Optional[Dict[str, np.ndarray]] = None
+
+    def __init__(self, tool_names: Sequence[str], threshold: float = 0.45, max_calls: int = 3, max_section_lookups: int = 2):
+        self.tool_names = set(tool_names)
+        self.threshold = threshold
+        self.max_calls = max_calls
+        self.max_section_lookups = max_section_lookups
+        self.reference_tool = "Cosmology Knowledge Base" if "Cosmology Knowledge Base" in self.tool_names else "Wikipedia"
+
+    @classmethod
+    async def _prototypes(cls) -> Dict[str, np.ndarray]:
+        if cls._prototype_vectors is None:
+            cls._prototype_vectors = {tool: await aembed_texts(texts) for tool, texts in TOOL_PROTOTYPES.items()}
+        return cls._prototype_vectors
+
+    async def _similarities(self, vector: np.ndarray) -> Dict[str, float]:
+        return {tool: float((prototypes @ vector[0]).max()) for tool, prototypes in (await self._prototypes()).items()}
+
+    async def _relevant_sections(self, vector: np.ndarray, sections: Sequence[str]) -> List[str]:
+        sections = [section for section in sections if not GENERIC_SECTIONS.match(section.strip())]
+        if len(sections) <= self.max_section_lookups:
+            return sections
+        scores = await aembed_texts(sections) @ vector[0]
+        top = sorted(np.argsort(-scores)[:self.max_section_lookups])
+        return [sections[i] for i in top]
+
+    def _call(self, name: str, args: dict) -> Optional[dict]:
+        return {"name": name, "args": args} if name in self.tool_names else None
+
+    @staticmethod
+    def _expressions(query: str) -> List[str]:
+        """
+        Arithmetic in the query: only with a cue ("calculate ...", "what is ...", "... =") or with
+        spaced operators, so ranges and ratios in prose ("13-14 billion years", "24/12") are left alone.
+        """
+        cued = MATH_CUE.search(query) is not None
+        expressions = []
+        for match in EXPRESSION.finditer(query):
+            expression = match.group().strip()
+            if DATE_LIKE.match(expression) or expression.count("(") != expression.count(")"):
+                continue
+            if RANGE.match(expression) and re.match(r"\s*[^\W\d_]", query[match.end():]):
+                continue
+            explicit = cued or ASKED_VALUE.search(query[:match.start()]) or re.match(r"\s*=", query[match.end():])
+            if explicit or not TIGHT_OPERATOR.search(re.sub(NUMBER, "N", expression, flags=re.I)):
+                expressions.append(expression.replace("^", "**"))
+        return expressions
+
+    @staticmethod
+    def _topic(query: str, max_words: int = 6) -> str:
+        """The query's content words, e.g. "black holes form" for "Can you explain how black holes form?"."""
+        return " ".join([word for word in tokenize(query) if word not in STOPWORDS and len(word) > 2][:max_words])
+
+    def _cosmology_call(self, query: str) -> Optional[dict]:
+        """A Calculator call for questions like "how far is z=2" or "age of the universe at redshift 1100"."""
+        redshifts = REDSHIFT.findall(query)
+        function = next((name for pattern, name in COSMOLOGY_QUANTITIES if pattern.search(query)), None)
+        if not redshifts or function is None:
+            return None
+        argument = redshifts[0] if len(redshifts) == 1 else f"[{', '.join(redshifts)}]"
+        return self._call("Calculator", {"expression": f"{function}({argument})"})
+
+    async def aroute(self, query: str, sections: Sequence[str] = ()) -> Optional[List[dict]]:
+        calls = [self._call("Web URL", {"url": url.rstrip(".,;"), "query": query}) for url in URL.findall(query)]
+        calls += [self._call("Calculator", {"expression": expression}) for expression in self._expressions(query)]
+
+        calls.append(self._cosmology_call(query))
+
+        vector = await aembed_query(query)
+        similarities = await self._similarities(vector)
+        if RECENCY.search(query) or similarities["DuckDuckGo"] >= self.threshold:
+            calls.append(self._call("DuckDuckGo", {"query": query}))
+
+        lookups = await self._relevant_sections(vector, sections)
+        if lookups:
+            # A bare heading like "Formation" finds unrelated pages; qualify it with the query's topic.
+            topic = self._topic(query)
+            calls += [self._call(self.reference_tool, {"query": f"{topic} {section}".strip()}) for section in lookups]
+        elif similarities["Reference"] >= self.threshold:
+            calls.append(self._call(self.reference_tool, {"query": query}))
+
+        unique, seen = [], set()
+        for call in calls:
+            if call is not None and (call["name"], str(call["args"])) not in seen:
+                seen.add((call["name"], str(call["args"])))
+                unique.append({**call, "id": f"router-{len(unique)}"})
+        if not unique:
+            metrics.incr("router.llm_fallbacks")
+            return None
+        metrics.incr("router.local_routes")
+        metrics.incr("router.tool_calls", min(len(unique), self.max_calls))
+        return unique[:self.max_calls]
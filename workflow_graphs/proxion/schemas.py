@@ -17,10 +17,14 @@ class WorkFlowState(TypedDict):
     is_satisfactory: bool
     requires_tool_call : bool
     feedback: str
+    section_verdicts: List[dict]
+    pipeline_profile: Literal["fast", "full"]
+    mode_applied: bool
 
 
 class SectionsOutput(BaseModel):
     sections: List[str] = Field(
+        default_factory=list,
         description="Relevant sections for this topic. The response will always contain general sections based on the user query. "
                     "If the question involves speculative ideas or hypotheses, additional perspectives will be appended: "
                     "Scientific View (scientific explanation based on physics and cosmology), "
@@ -37,20 +41,32 @@ class CosmologyQueryCheck(BaseModel):
                     "If false, the query might be a greeting, farewell, or a general question about the chatbot (Proxion) itself, "
                     "which can be answered directly without additional refinement."
     )
+    requires_tool_call: bool = Field(
+        default=False,
+        description="Indicates whether external knowledge, real-time data, or the latest sources (e.g., Wikipedia, Arxiv, DuckDuckGo) "
+                    "are required to enhance the response based on the user query."
+    )
     response: str = Field(
+        default="",
         description="If the query is not related to cosmology:\n"
                     "- For greetings (e.g., 'Hi', 'Hello'), respond warmly (e.g., 'Hi! How can I assist you today?').\n"
                     "- For farewells (e.g., 'Goodbye', 'See you'), respond appropriately (e.g., 'Goodbye! Have a great day!').\n"
                     "- For chatbot-related queries (e.g., 'Who are you?'), provide relevant details (e.g., 'I am Proxion, an AI assistant created by Madhu Bagamma Gari, specializing in cosmology and space sciences.').\n"
                     "- For completely unrelated questions (e.g., 'Who is Modi?'), politely inform the user that Proxion only focuses on cosmology (e.g., 'I focus only on cosmology-related topics. Let’s talk about the wonders of the universe!')."
     )
-    requires_tool_call: bool = Field(
-        description="Indicates whether external knowledge, real-time data, or the latest sources (e.g., Wikipedia, Arxiv, DuckDuckGo) "
-                    "are required to enhance the response based on the user query."
-    )
   
 
+class SectionVerdict(BaseModel):
+    section: str = Field(description="The section heading exactly as it appears in the response.")
+    is_satisfactory: bool = Field(default=True, description="Indicates if this section is accurate, complete and well formatted.")
+    feedback: str = Field(default="", description="What to fix in this section, if anything.")
+
+
 class ResponseFeedback(BaseModel):
     is_satisfactory: bool = Field(description="Indicates if the response is scientifically accurate and complete.")
-    feedback: str = Field(description="Feedback on how to improve the answer if needed.")
+    feedback: str = Field(default="", description="Feedback on how to improve the answer if needed.")
+    section_verdicts: List[SectionVerdict] = Field(
+        default_factory=list,
+        description="One verdict per section heading of the response, so only the flagged sections are rewritten."
+    )
 
@@ -0,0 +1,72 @@
+import re
+from typing import Dict, List, Tuple
+
+
+HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(re.sub(r"[*_`#:]+", " ", title).lower().split())
+
+
+def strip_heading(body: str, title: str) -> str:
+    """Drops a leading heading the model added for the section it was asked to write."""
+    lines = body.strip().splitlines()
+    if lines:
+        match = HEADING.match(lines[0])
+        if match and normalize_title(match.group(2)) == normalize_title(title):
+            lines = lines[1:]
+    return "\n".join(lines).strip()
+
+
+def assemble_sections(sections: List[Tuple[str, str]], level: int = 2) -> str:
+    """Deterministic Markdown: one heading per section, in the given order, skipping empty bodies."""
+    marker = "#" * level
+    return "\n\n".join(f"{marker} {title}\n\n{body.strip()}" for title, body in sections if body.strip())
+
+
+FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def split_sections(markdown: str) -> Tuple[str, List[dict]]:
+    """
+    Splits Markdown at its top-level headings (ignoring code fences, and a lone title heading above
+    them) into a preamble and `{"title", "heading", "body"}` sections.
+    """
+    lines = markdown.splitlines()
+    headings, in_fence = [], False
+    for index, line in enumerate(lines):
+        if FENCE.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else HEADING.match(line)
+        if match:
+            headings.append((index, len(match.group(1)), match.group(2)))
+    if not headings:
+        return markdown, []
+
+    level = min(heading[1] for heading in headings)
+    top = [heading for heading in headings if heading[1] == level]
+    if len(top) == 1 and len(headings) > 1:
+        level = min(heading[1] for heading in headings if heading[1] > level)
+        top = [heading for heading in headings if heading[1] == level]
+
+    sections = []
+    for position, (index, _, title) in enumerate(top):
+        end = top[position + 1][0] if position + 1 < len(top) else len(lines)
+        sections.append({"title": title, "heading": lines[index], "body": "\n".join(lines[index + 1:end]).strip("\n")})
+    return "\n".join(lines[:top[0][0]]), sections
+
+
+def join_sections(preamble: str, sections: List[dict]) -> str:
+    parts = [preamble.strip()] if preamble.strip() else []
+    parts += [f"{section['heading']}\n\n{section['body'].strip()}" for section in sections]
+    return "\n\n".join(parts)
+
+
+def splice_sections(markdown: str, rewrites: Dict[int, str]) -> str:
+    """Replaces the bodies of the sections at the indexes in `rewrites` (as numbered by `split_sections`), keeping everything else."""
+    preamble, sections = split_sections(markdown)
+    for index, body in rewrites.items():
+        sections[index]["body"] = body
+    return join_sections(preamble, sections)
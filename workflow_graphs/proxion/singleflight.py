@@ -0,0 +1,164 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def single_flight_key(query: str, mode: str) -> str:
+    normalized = " ".join(query.lower().split()).rstrip("?!. ")
+    return f"singleflight:{mode.lower()}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+
+class Flight:
+    """One in-progress pipeline run in this process and the status listeners of its local followers."""
+
+    def __init__(self):
+        self.future : asyncio.Future = asyncio.get_running_loop().create_future()
+        self.listeners : List[Callable[[str], Awaitable]] = []
+        self.last_status : Optional[str] = None
+
+    async def broadcast(self, message: str):
+        self.last_status = message
+        for listener in list(self.listeners):
+            try:
+                await listener(message)
+            except Exception as e:
+                logger.warning("Failed to forward a status to a coalesced request: %s", e)
+
+
+class FanOutConsumer:
+    """Stands in for the leader's consumer in the workflow state, copying every status to the followers."""
+
+    def __init__(self, consumer : object, flight : Flight, publish : Callable[[dict], Awaitable]):
+        self.consumer = consumer
+        self.flight = flight
+        self.publish = publish
+
+    async def send_status(self, msg: str = ''):
+        await self.consumer.send_status(msg)
+        await self.flight.broadcast(msg)
+        await self.publish({"type": "status", "content": msg})
+
+    def __getattr__(self, name):
+        return getattr(self.consumer, name)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent runs of the same work: the first caller for a key leads and runs it, later
+    callers wait for its result and receive its status messages. With `redis_url`, a Redis lock
+    elects one leader across workers and results and statuses travel over pub/sub (the result is
+    also kept for a few seconds for followers that subscribe late). A follower whose leader fails
+    or times out runs the work itself.
+    """
+
+    def __init__(self, redis_url: str = None, lock_ttl: float = 180.0, wait_timeout: float = 180.0, result_ttl: int = 30):
+        self.redis = None
+        if redis_url:
+            import redis.asyncio
+            self.redis = redis.asyncio.Redis.from_url(redis_url)
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.result_ttl = result_ttl
+        self._flights : Dict[str, Flight] = {}
+
+    async def run(self, key: str, func: Callable[[object], Awaitable[dict]], consumer : object) -> dict:
+        """`func(consumer)` once per key at a time; followers get the leader's result."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            metrics.incr("singleflight.local_followers")
+            flight.listeners.append(consumer.send_status)
+            try:
+                if flight.last_status:
+                    await consumer.send_status(flight.last_status)
+                result = await asyncio.wait_for(asyncio.shield(flight.future), self.wait_timeout)
+            except asyncio.TimeoutError:
+                result = None
+            finally:
+                flight.listeners.remove(consumer.send_status)
+            if result is not None:
+                return result
+            metrics.incr("singleflight.fallbacks")
+            return await func(consumer)
+
+        flight = self._flights[key] = Flight()
+        lock = None
+        result = None
+        try:
+            if self.redis is not None:
+                lock, result = await self._lead_or_follow(key, consumer, flight)
+            if result is None:
+                metrics.incr("singleflight.leaders")
+                result = await func(FanOutConsumer(consumer, flight, lambda event: self._publish(key, event, lock)))
+                await self._publish(key, {"type": "result", "data": result}, lock)
+            return result
+        except Exception:
+            await self._publish(key, {"type": "error"}, lock)
+            raise
+        finally:
+            del self._flights[key]
+            if not flight.future.done():
+                flight.future.set_result(result)
+            if lock is not None:
+                try:
+                    await lock.release()
+                except Exception:
+                    pass
+
+    async def _lead_or_follow(self, key: str, consumer : object, flight : Flight):
+        """Returns `(lock, None)` when this worker leads, or `(None, result)` when another worker's result arrived."""
+        try:
+            lock = self.redis.lock(f"{key}:lock", timeout=self.lock_ttl)
+            if await lock.acquire(blocking=False):
+                await self.redis.delete(f"{key}:result")
+                return lock, None
+            metrics.incr("singleflight.remote_followers")
+            result = await asyncio.wait_for(self._follow_remote(key, consumer, flight), self.wait_timeout)
+        except Exception as e:
+            logger.warning("Single-flight coordination failed for %s, running the request directly: %s", key, e)
+            result = None
+        if result is None:
+            metrics.incr("singleflight.fallbacks")
+        return None, result
+
+    async def _follow_remote(self, key: str, consumer : object, flight : Flight) -> Optional[dict]:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(f"{key}:events")
+        try:
+            stored = await self.redis.get(f"{key}:result")
+            if stored:
+                return json.loads(stored)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                event = json.loads(message["data"])
+                if event["type"] == "status":
+                    await consumer.send_status(event["content"])
+                    await flight.broadcast(event["content"])
+                elif event["type"] == "result":
+                    return event["data"]
+                else:
+                    return None
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def _publish(self, key: str, event: dict, lock):
+        if lock is None:
+            return
+        try:
+            payload = json.dumps(event, default=str)
+            if event["type"] == "result":
+                await self.redis.set(f"{key}:result", payload, ex=self.result_ttl)
+            await self.redis.publish(f"{key}:events", payload)
+        except Exception as e:
+            logger.warning("Failed to publish a single-flight event for %s: %s", key, e)
+
+
+single_flight = SingleFlight(redis_url=os.getenv('SINGLE_FLIGHT_REDIS_URL'))
@@ -0,0 +1,266 @@
+import json
+import re
+import logging
+from contextlib import aclosing
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, convert_to_messages
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_BARE_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_DANGLING_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*$')
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a structured response can neither be repaired locally nor obtained by re-asking the model."""
+
+
+def repair_json(raw: str) -> str:
+    """
+    Repairs the JSON defects models commonly produce: Markdown fences, prose around the object,
+    single-quoted strings, Python literals, raw newlines inside strings, trailing commas and
+    objects cut off before their closing quotes and brackets.
+    """
+    text = _FENCE_PATTERN.sub("", raw.strip())
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        text = text[min(starts):]
+
+    out : List[str] = []
+    closers : List[str] = []
+    quote = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == "\\" and i + 1 < len(text):
+                # `\'` is valid in a single-quoted string but not in JSON, where the quote needs no escape.
+                out.append("'" if text[i + 1] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if char == quote:
+                out.append('"')
+                quote = None
+            elif char == '"':
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\t":
+                out.append("\\t")
+            else:
+                out.append(char)
+        elif char in "\"'":
+            quote = char
+            out.append('"')
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+            out.append(char)
+        elif char in "}]":
+            while out and out[-1].strip() in ("", ","):
+                out.pop()
+            if closers:
+                closers.pop()
+            out.append(char)
+            if not closers:
+                break
+        elif char.isalpha() or char == "_":
+            word = re.match(r"[A-Za-z_][A-Za-z0-9_]*", text[i:]).group(0)
+            previous = "".join(out).rstrip()[-1:]
+            if previous.isdigit() or previous == ".":
+                out.append(word)
+            elif word in ("true", "false", "null") or word in _BARE_LITERALS:
+                out.append(_BARE_LITERALS.get(word, word))
+            else:
+                out.append(f'"{word}"')
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    if quote:
+        out.append('"')
+    while out and out[-1].strip() in ("", ",", ":"):
+        out.pop()
+    repaired = "".join(out)
+    if closers and closers[-1] == "}":
+        # An object cut off between a key and its value: drop the key.
+        repaired = _DANGLING_KEY.sub(lambda match: "" if match.group(1) == "," else match.group(1), repaired)
+    return repaired + "".join(reversed(closers))
+
+
+def coerce_to_schema(data: Any, schema: Type[SchemaT]) -> SchemaT:
+    """Validates parsed JSON against `schema`, unwrapping common envelopes; missing optional fields take the schema defaults."""
+    fields = schema.model_fields
+    if isinstance(data, list):
+        list_fields = [name for name, field in fields.items() if getattr(field.annotation, "__origin__", None) in (list, List)]
+        if len(list_fields) == 1:
+            data = {list_fields[0]: data}
+    if isinstance(data, dict) and not set(data) & set(fields) and len(data) == 1:
+        inner = next(iter(data.values()))
+        if isinstance(inner, dict):
+            data = inner
+    return schema.model_validate(data)
+
+
+def parse_structured(raw: str, schema: Type[SchemaT]) -> tuple:
+    """Returns `(parsed, was_repaired)` or raises `StructuredOutputError`."""
+    try:
+        return coerce_to_schema(json.loads(raw), schema), False
+    except (ValueError, ValidationError):
+        pass
+    try:
+        return coerce_to_schema(json.loads(repair_json(raw)), schema), True
+    except (ValueError, ValidationError) as e:
+        raise StructuredOutputError(str(e)) from e
+
+
+class IncrementalJSONParser:
+    """
+    Parses the top-level fields of a JSON object while it streams in: `feed` returns the fields its
+    text completed, and `fields` holds everything parsed so far. Strings, objects and arrays are
+    complete at their closing character, other scalars at the following `,` or `}`. Text before the
+    opening brace, such as a Markdown fence, is skipped.
+    """
+
+    def __init__(self):
+        self.fields : Dict[str, Any] = {}
+        self._buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start : Optional[int] = None
+        self._key : Optional[str] = None
+
+    @property
+    def is_complete(self) -> bool:
+        return self._depth < 0
+
+    def _close_token(self, end: int, finished: Dict[str, Any]):
+        if self._start is None:
+            return
+        token = self._buffer[self._start:end].strip()
+        self._start = None
+        try:
+            value = json.loads(_BARE_LITERALS.get(token, token))
+        except ValueError:
+            # Left for the whole-reply parse, which repairs what it can.
+            self._key = None
+            return
+        if self._key is None:
+            self._key = str(value)
+        else:
+            self.fields[self._key] = finished[self._key] = value
+            self._key = None
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        self._buffer += text
+        finished : Dict[str, Any] = {}
+        while self._position < len(self._buffer) and not self.is_complete:
+            char = self._buffer[self._position]
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._close_token(self._position + 1, finished)
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._start is None:
+                    self._start = self._position
+            elif char in "{[":
+                if self._depth == 1 and self._start is None:
+                    self._start = self._position
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._close_token(self._position + 1, finished)
+                elif self._depth == 0:
+                    self._close_token(self._position, finished)
+                    self._depth = -1
+            elif self._depth == 1 and char in ",:":
+                self._close_token(self._position, finished)
+            elif self._depth == 1 and self._start is None and not char.isspace():
+                self._start = self._position
+            self._position += 1
+        return finished
+
+
+class TolerantStructuredOutput:
+    """
+    A drop-in for `llm.with_structured_output(schema, method="json_mode")` that repairs
+    malformed JSON locally and only re-asks the model when the reply cannot be salvaged.
+    """
+
+    def __init__(self, llm: BaseChatModel, schema: Type[SchemaT], max_reasks: int = 1):
+        self.llm = llm.bind(response_format={"type": "json_object"})
+        self.schema = schema
+        self.max_reasks = max_reasks
+        self.metric_prefix = f"structured.{schema.__name__}"
+
+    def _reask_message(self, error: str) -> HumanMessage:
+        keys = ", ".join(f"`{name}`" for name in self.schema.model_fields)
+        return HumanMessage(content=(
+            f"Your previous reply could not be parsed ({error}). "
+            f"Reply again with only a single JSON object containing the keys: {keys}."
+        ))
+
+    async def ainvoke(self, input: Any, config=None, ready: Callable[[Dict[str, Any]], bool] = None, **kwargs) -> SchemaT:
+        """
+        With `ready`, streams the reply and returns as soon as `ready(fields parsed so far)` holds,
+        closing the stream and leaving the unsent fields at their schema defaults.
+        """
+        messages = convert_to_messages([input] if isinstance(input, str) else input)
+        content = None
+        if ready is not None:
+            parser = IncrementalJSONParser()
+            chunks : List[str] = []
+            try:
+                async with aclosing(self.llm.astream(messages, config, **kwargs)) as stream:
+                    async for chunk in stream:
+                        chunks.append(chunk.content)
+                        if not parser.feed(chunk.content) or parser.is_complete or not ready(parser.fields):
+                            continue
+                        try:
+                            parsed = coerce_to_schema(dict(parser.fields), self.schema)
+                        except ValidationError:
+                            continue
+                        metrics.incr(f"{self.metric_prefix}.early")
+                        return parsed
+                content = "".join(chunks)
+            except Exception as e:
+                logger.warning("Streaming %s failed, requesting the full response instead: %s", self.schema.__name__, e)
+        return await self._parse_with_reasks(messages, content, config, **kwargs)
+
+    async def _parse_with_reasks(self, messages: list, content: Optional[str], config=None, **kwargs) -> SchemaT:
+        for attempt in range(self.max_reasks + 1):
+            if content is None:
+                content = (await self.llm.ainvoke(messages, config, **kwargs)).content
+            try:
+                parsed, repaired = parse_structured(content, self.schema)
+            except StructuredOutputError as e:
+                if attempt == self.max_reasks:
+                    metrics.incr(f"{self.metric_prefix}.failed")
+                    raise
+                metrics.incr(f"{self.metric_prefix}.reasked")
+                messages = [*messages, AIMessage(content=content), self._reask_message(str(e).splitlines()[0])]
+                content = None
+                continue
+            metrics.incr(f"{self.metric_prefix}.repaired" if repaired else f"{self.metric_prefix}.clean")
+            return parsed
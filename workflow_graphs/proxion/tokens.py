@@ -0,0 +1,105 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence, Union
+from langchain_core.messages import BaseMessage
+
+
+# <|start_header_id|>role<|end_header_id|>\n\n ... <|eot_id|> around every Llama 3 chat message.
+MESSAGE_OVERHEAD = 4
+
+_APPROXIMATE_PIECES = re.compile(r"\w{1,4}|[^\w\s]|\s+")
+
+
+class LlamaTokenCounter:
+    """
+    Counts tokens for the Llama model family with a tokenizer loaded once per process from a
+    local `tokenizer.json` (`PROXION_TOKENIZER_PATH`). Counts are memoized by content hash, so a
+    message is tokenized at most once no matter how many prompts it appears in.
+
+    Without a local tokenizer file the counter falls back to a word-piece approximation
+    that slightly over-counts, which keeps token budgets on the safe side.
+    """
+
+    def __init__(self, tokenizer_path: Optional[str] = None, cache_size: int = 50_000):
+        self.tokenizer_path = tokenizer_path or os.getenv('PROXION_TOKENIZER_PATH')
+        self.tokenizer = self._load_tokenizer(self.tokenizer_path)
+        self.cache_size = cache_size
+        self._cache : "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_tokenizer(path: Optional[str]):
+        if not path or not os.path.exists(path):
+            return None
+        from tokenizers import Tokenizer
+        return Tokenizer.from_file(path)
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _encode_many(self, texts: Sequence[str]) -> List[int]:
+        if self.tokenizer is None:
+            return [len(_APPROXIMATE_PIECES.findall(text)) for text in texts]
+        return [len(encoding.ids) for encoding in self.tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+    def count_texts(self, texts: Iterable[str]) -> List[int]:
+        """Batch-counts texts, tokenizing only the ones not seen before."""
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        counts : List[Optional[int]] = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for index, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    counts[index] = self._cache[key]
+                else:
+                    missing.setdefault(key, []).append(index)
+        if missing:
+            fresh = self._encode_many([texts[indexes[0]] for indexes in missing.values()])
+            with self._lock:
+                for (key, indexes), count in zip(missing.items(), fresh):
+                    self._cache[key] = count
+                    for index in indexes:
+                        counts[index] = count
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return counts
+
+    def count_text(self, text: str) -> int:
+        return self.count_texts([text])[0]
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> List[int]:
+        return [count + MESSAGE_OVERHEAD for count in self.count_texts(message_text(message) for message in messages)]
+
+    def count_message(self, message: BaseMessage) -> int:
+        return self.count_messages([message])[0]
+
+    def __call__(self, messages: Union[BaseMessage, Sequence[BaseMessage]]) -> int:
+        """Total token count, usable as the `token_counter` of `trim_messages`."""
+        if isinstance(messages, BaseMessage):
+            messages = [messages]
+        return sum(self.count_messages(messages))
+
+
+def message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in message.content)
+
+
+_token_counter : Optional[LlamaTokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> LlamaTokenCounter:
+    """The process-wide token counter; the tokenizer is loaded on first use only."""
+    global _token_counter
+    with _token_counter_lock:
+        if _token_counter is None:
+            _token_counter = LlamaTokenCounter()
+        return _token_counter
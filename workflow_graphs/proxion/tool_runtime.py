@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from langchain_core.tools import BaseTool
+from .metrics import metrics
+
+
+DEFAULT_TOOL_CONCURRENCY = {"Web URL": 4, "DuckDuckGo": 2, "Wikipedia": 4}
+
+tool_executor = ThreadPoolExecutor(max_workers=int(os.getenv('TOOL_WORKERS', 8)), thread_name_prefix="tools")
+
+_process_pool : Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """A process pool for CPU-heavy parsing, created on first use when `TOOL_PROCESS_WORKERS` is set; otherwise `None`."""
+    global _process_pool
+    workers = int(os.getenv('TOOL_PROCESS_WORKERS', 0))
+    if workers <= 0:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=workers)
+        return _process_pool
+
+
+class ToolRunner:
+    """
+    Runs tools off the default asyncio executor: synchronous tools go to the dedicated `tool_executor`
+    (`TOOL_WORKERS` threads) and tools with a native coroutine are awaited directly. Each tool is also
+    capped by its own semaphore, so one slow tool cannot occupy the whole pool.
+
+    Reports `tools.<name>.queue_seconds` (semaphore plus pool wait), `tools.<name>.run_seconds` and
+    `tools.<name>.in_flight`.
+    """
+
+    def __init__(self, limits: Dict[str, int] = None, default_limit: int = 4, executor : ThreadPoolExecutor = None):
+        self.limits = {**DEFAULT_TOOL_CONCURRENCY, **(limits or {})}
+        self.default_limit = default_limit
+        self.executor = executor or tool_executor
+        self._semaphores : Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(self.limits.get(name, self.default_limit))
+        return self._semaphores[name]
+
+    async def run(self, tool : BaseTool, args: dict, timeout: float = None):
+        """
+        Runs `tool` with `args`. `timeout` covers only the run itself, not the wait for a slot or a
+        pool thread. A thread cannot be interrupted, so one that times out keeps its tool's slot
+        until it returns, and a hung upstream cannot pile up threads beyond the tool's limit.
+        """
+        queued = time.perf_counter()
+        started = []
+        semaphore = self._semaphore(tool.name)
+        await semaphore.acquire()
+        metrics.incr(f"tools.{tool.name}.in_flight")
+
+        def release():
+            semaphore.release()
+            metrics.incr(f"tools.{tool.name}.in_flight", -1)
+            if started:
+                metrics.observe(f"tools.{tool.name}.queue_seconds", started[0] - queued)
+                metrics.observe(f"tools.{tool.name}.run_seconds", time.perf_counter() - started[0])
+
+        future = None
+        try:
+            if getattr(tool, "coroutine", None) is not None:
+                started.append(time.perf_counter())
+                return await asyncio.wait_for(tool.ainvoke(args), timeout)
+
+            loop = asyncio.get_running_loop()
+            running = loop.create_future()
+
+            def call():
+                started.append(time.perf_counter())
+                loop.call_soon_threadsafe(lambda: running.done() or running.set_result(None))
+                return tool.invoke(args)
+
+            future = loop.run_in_executor(self.executor, contextvars.copy_context().run, call)
+            await asyncio.wait({running, future}, return_when=asyncio.FIRST_COMPLETED)
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            metrics.incr(f"tools.{tool.name}.timeouts")
+            raise
+        finally:
+            if future is not None and not future.done():
+                future.add_done_callback(self._release_when_done(release))
+            else:
+                release()
+
+    @staticmethod
+    def _release_when_done(release: Callable[[], None]) -> Callable[[asyncio.Future], None]:
+        def callback(future : asyncio.Future):
+            if not future.cancelled():
+                future.exception()  # Nobody awaits an abandoned run; retrieve its error so it is not logged as lost.
+            release()
+        return callback
+
+tool_runner = ToolRunner(default_limit=int(os.getenv('TOOL_CONCURRENCY', 4)))
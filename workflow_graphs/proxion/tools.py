@@ -1,13 +1,46 @@
-from typing import Annotated
-from langchain_core.tools import tool
+import os
+import time
+import asyncio
+import threading
+from typing import Annotated, Callable, Dict, List, Optional
+from langchain_core.tools import BaseTool, StructuredTool, tool
 from langchain_community.utilities import WikipediaAPIWrapper
 from langchain_community.tools import WikipediaQueryRun, DuckDuckGoSearchRun
-from langchain_community.document_loaders import UnstructuredURLLoader
-import re
+import httpx
+from lxml.etree import ParserError
 from duckduckgo_search.exceptions import RatelimitException
+from .cache import CachedResult, CachedToolFailure, TransientResult, cached_tool
+from .calculator import CalculatorError, evaluate, format_result
+from .knowledge_base import knowledge_base
+from .metrics import metrics
+from .tool_runtime import ToolRunner, tool_runner
+from .web_extract import WebFetchError, WebFetchTimeout, web_extractor
+
+
+RATE_LIMIT_MESSAGE = "Failed to get context from the web due to rate limiting."
+WEB_URL_FAILURE = "Failed to retrieve content from"
+# `InvalidURL` is not an `HTTPError`; `UnsupportedProtocol` is, but is listed to make the intent explicit.
+WEB_URL_ERRORS = (httpx.HTTPError, httpx.InvalidURL, httpx.UnsupportedProtocol, WebFetchError, ParserError)
+WEB_URL_TRANSIENT_ERRORS = (httpx.TimeoutException, httpx.NetworkError, WebFetchTimeout)
+
+
+@tool("Cosmology Knowledge Base")
+def knowledge_base_tool(query: Annotated[str, "The cosmology or astronomy topic to look up."]) -> str:
+    """
+    Searches Proxion's offline cosmology and astronomy knowledge base. Fast and always available,
+    so prefer it over the web tools for established science.
+
+    Returns:
+        str: The most relevant passages, each prefixed with its source title.
+    """
+    passages = knowledge_base.search(query)
+    if not passages:
+        return "No relevant passages found in the knowledge base."
+    return "\n\n".join(f"[{passage['title']}] {passage['text']}" for passage in passages)
 
 
 @tool("Wikipedia")
+@cached_tool("Wikipedia", ttl=24 * 3600, negative_ttl=300, is_failure=lambda result: result.startswith("No good Wikipedia Search Result"))
 def wikipedia_tool(query: Annotated[str, "The search term to find relevant information from Wikipedia."]) -> str:
     """
     Retrieves a summary from Wikipedia based on the provided query.
@@ -21,6 +54,7 @@ def wikipedia_tool(query: Annotated[str, "The search term to find relevant infor
 
 
 @tool("DuckDuckGo")
+@cached_tool("DuckDuckGo", ttl=3600, negative_ttl=60)
 def duckduckgo_search_tool(query: Annotated[str, "The search term to find information from DuckDuckGo."]) -> str:
     """
     Searches the web using DuckDuckGo and returns the results.
@@ -32,47 +66,212 @@ def duckduckgo_search_tool(query: Annotated[str, "The search term to find inform
         search = DuckDuckGoSearchRun(name="Search")
         return search.run(query)
     except RatelimitException:
-        return "Failed to get context from the web due to rate limiting."
+        return TransientResult(RATE_LIMIT_MESSAGE)
+
+
+def _web_url_failure(url: str, error: Exception) -> str:
+    """The failure message for `url`; timeouts, connection errors, 429s and 5xx responses are transient."""
+    message = f"{WEB_URL_FAILURE} {url}: {error}"
+    if isinstance(error, httpx.HTTPStatusError):
+        transient = error.response.status_code == 429 or error.response.status_code >= 500
+    else:
+        transient = isinstance(error, WEB_URL_TRANSIENT_ERRORS)
+    return TransientResult(message) if transient else message
+
 
+def _format_web_page(url: str, title: str, passages: list) -> str:
+    if not passages:
+        return f"{WEB_URL_FAILURE} {url}: no readable content."
+    content : str = f"Title: {title}\n\n" if title else ""
+    for passage in passages:
+        content += f"Content: {passage}\n\n"
+    return content
 
-@tool("Web URL")
-def web_url_tool(url: Annotated[str, "A single URL to retrieve content from."]) -> str:
+
+@cached_tool("Web URL", ttl=6 * 3600, negative_ttl=300, is_failure=lambda result: result.startswith(WEB_URL_FAILURE), normalize=lambda arguments: arguments)
+def _web_url(
+    url: Annotated[str, "A single URL to retrieve content from."],
+    query: Annotated[str, "What to look for on the page; only the most relevant passages are returned."] = "",
+) -> str:
     """
-    Web Scrap the content from the given URL.
+    Web Scrap the main content of the given URL, keeping the passages most relevant to the query.
 
     Returns:
-        str: A string summarizing the content retrieved from the URL.
+        str: The page title and its most relevant passages, or an error message.
     """
     if not url:
         return "No URL provided."
+    try:
+        title, passages = web_extractor.extract(url, query)
+    except WEB_URL_ERRORS as e:
+        return _web_url_failure(url, e)
+    return _format_web_page(url, title, passages)
+
 
-    loader: UnstructuredURLLoader = UnstructuredURLLoader(urls=[url])  
-    docs: list = loader.load()  
-    content: str = ""  
+@cached_tool("Web URL", ttl=6 * 3600, negative_ttl=300, is_failure=lambda result: result.startswith(WEB_URL_FAILURE), normalize=lambda arguments: arguments)
+async def _aweb_url(url: str, query: str = "") -> str:
+    if not url:
+        return "No URL provided."
+    try:
+        title, passages = await web_extractor.aextract(url, query)
+    except WEB_URL_ERRORS as e:
+        return _web_url_failure(url, e)
+    return _format_web_page(url, title, passages)
 
-    for doc in docs:
-        content += f"Content: {doc.page_content.strip()}\n\n"  
-    return content  
+
+# Native async path (httpx.AsyncClient) for the workflow; the sync function serves `invoke`.
+web_url_tool = StructuredTool.from_function(func=_web_url, coroutine=_aweb_url, name="Web URL")
 
 
 @tool("Calculator")
-def calculator_tool(expression: Annotated[str, "A string containing a mathematical expression"]) -> float:
+def calculator_tool(expression: Annotated[str, "A mathematical expression, e.g. '3 * Mpc / ly' or 'lookback_time([0.5, 1, 2])'"]) -> str:
     """
-    Evaluates a basic arithmetic expression and returns the result.
-        
+    Safely evaluates a mathematical expression. Supports + - * / ** % and parentheses, lists of
+    numbers (evaluated element-wise), constants and units in SI (c, G, h, k_B, pi, m, km, AU, ly, pc,
+    kpc, Mpc, yr, Gyr, M_sun, ...; divide by a unit to convert), math functions (sqrt, log, exp, sin,
+    linspace, ...) and flat ΛCDM cosmology functions of redshift z with optional H0 and Om0:
+    hubble(z) in km/s/Mpc; comoving_distance(z), luminosity_distance(z), angular_diameter_distance(z)
+    in Mpc; lookback_time(z) and age(z) in Gyr.
+
     Returns:
-        float: The result of the evaluated expression or an error message if invalid.
+        str: The expression and its result (a list for array inputs), or an error message if invalid.
     """
-    
-    valid_pattern = r'^[\d\s+\-*/().]+$'
-    
-    
-    if not re.match(valid_pattern, expression):
-        return "Error: Invalid expression. Only numbers and +, -, *, / operators are allowed."
-    
     try:
-        # Evaluate the expression
-        result = eval(expression)
+        return format_result(evaluate(expression), expression)
+    except CalculatorError as e:
+        return f"Error: {e}"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a tool whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast on a tool that keeps failing. After `failure_threshold` consecutive failures
+    (exceptions, timeouts or results matching `is_failure`) the circuit opens and calls are refused
+    for `reset_timeout` seconds; then a single half-open trial decides whether it closes again.
+    Results served from the tool cache never reached the service, so they are not counted.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0, timeout: float = 15.0,
+                 is_failure: Callable[[object], bool] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timeout = timeout
+        self.is_failure = is_failure
+        self.failures = 0
+        self.opened_at : Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        return self.HALF_OPEN if time.monotonic() - self.opened_at >= self.reset_timeout else self.OPEN
+
+    def is_available(self) -> bool:
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self.trial_in_flight)
+
+    def _acquire(self) -> bool:
+        """Admits a call; returns whether it is the half-open trial."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                metrics.incr(f"circuit.{self.name}.half_open_trials")
+                return True
+            metrics.incr(f"circuit.{self.name}.short_circuited")
+            raise CircuitOpenError(f"{self.name} is temporarily unavailable.")
+
+    def _record(self, success: bool, trial: bool):
+        with self._lock:
+            if trial:
+                self.trial_in_flight = False
+            if success:
+                if self.opened_at is not None:
+                    metrics.incr(f"circuit.{self.name}.closed")
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            metrics.incr(f"circuit.{self.name}.failures")
+            if trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                metrics.incr(f"circuit.{self.name}.opened")
+
+    def _skip(self, trial: bool):
+        """Releases a call that never reached the upstream service, recording nothing."""
+        with self._lock:
+            self.trial_in_flight = self.trial_in_flight and not trial
+
+    async def acall(self, func, *args, **kwargs):
+        trial = self._acquire()
+        try:
+            result = await func(*args, **kwargs)
+        except CachedToolFailure:
+            # A remembered failure says nothing new about the upstream service.
+            self._skip(trial)
+            raise
+        except asyncio.TimeoutError:
+            metrics.incr(f"circuit.{self.name}.timeouts")
+            self._record(False, trial)
+            raise
+        except Exception:
+            self._record(False, trial)
+            raise
+        if isinstance(result, CachedResult):
+            self._skip(trial)
+            return result
+        self._record(not (self.is_failure and self.is_failure(result)), trial)
         return result
-    except Exception as e:
-        return f"Error: {str(e)}"
+
+
+TOOL_TIMEOUT = float(os.getenv('TOOL_TIMEOUT', 15))
+
+circuit_breakers : Dict[str, CircuitBreaker] = {
+    # "No good Wikipedia Search Result" is an answer, not an outage; only exceptions and timeouts count.
+    "Wikipedia": CircuitBreaker("Wikipedia", timeout=TOOL_TIMEOUT),
+    "DuckDuckGo": CircuitBreaker("DuckDuckGo", timeout=TOOL_TIMEOUT, reset_timeout=60.0,
+                                 is_failure=lambda result: result == RATE_LIMIT_MESSAGE),
+    "Web URL": CircuitBreaker("Web URL", timeout=web_extractor.timeout + 5,
+                              is_failure=lambda result: str(result).startswith(WEB_URL_FAILURE)),
+}
+
+# Substitutes for query-style tools while their circuit is open, in order of preference.
+TOOL_FALLBACKS : Dict[str, List[str]] = {
+    "DuckDuckGo": ["Cosmology Knowledge Base", "Wikipedia"],
+    "Wikipedia": ["Cosmology Knowledge Base", "DuckDuckGo"],
+}
+
+
+def is_tool_available(name: str) -> bool:
+    breaker = circuit_breakers.get(name)
+    return breaker is None or breaker.is_available()
+
+
+def resolve_tool(name: str, tools_by_name: Dict[str, BaseTool]) -> Optional[BaseTool]:
+    """The requested tool, or its first available fallback while its circuit is open; `None` if neither can run."""
+    if is_tool_available(name):
+        return tools_by_name.get(name)
+    for fallback in TOOL_FALLBACKS.get(name, []):
+        if fallback in tools_by_name and is_tool_available(fallback):
+            metrics.incr(f"circuit.{name}.fallbacks")
+            return tools_by_name[fallback]
+    return None
+
+
+async def ainvoke_tool(tool : BaseTool, args: dict, runner : ToolRunner = None):
+    """Runs a tool through the tool runner, guarded by its circuit breaker when it has one."""
+    runner = runner or tool_runner
+    breaker = circuit_breakers.get(tool.name)
+    if breaker is None:
+        return await runner.run(tool, args)
+    # The runner times only the run itself, so waiting for a free slot under load is not a failure.
+    return await breaker.acall(runner.run, tool, args, timeout=breaker.timeout)
@@ -0,0 +1,230 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from typing import List, Optional, Tuple
+import httpx
+import lxml.html
+from .metrics import metrics
+from .relevance import BM25, select_within_budget, split_sentences_lossless
+from .tokens import LlamaTokenCounter, get_token_counter
+from .tool_runtime import get_process_pool, tool_executor
+
+
+USER_AGENT = "Mozilla/5.0 (compatible; ProxionBot/1.0)"
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+DROP_TAGS = ("script", "style", "noscript", "template", "svg", "iframe", "form", "button", "nav", "header", "footer", "aside")
+BLOCK_TAGS = ("p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "pre", "blockquote", "dd", "dt", "td", "figcaption")
+BOILERPLATE = re.compile(r"comment|sidebar|footer|cookie|banner|share|social|related|advert|promo|breadcrumb|menu|navbar", re.I)
+
+
+class WebFetchError(RuntimeError):
+    """Raised for responses the extractor does not handle, such as binary content types."""
+
+
+class WebFetchTimeout(WebFetchError):
+    """Raised when a page sends no content within the time cap."""
+
+
+def _main_container(document: lxml.html.HtmlElement) -> lxml.html.HtmlElement:
+    """`<article>`/`<main>` when present, otherwise the element whose direct paragraphs hold the most text."""
+    candidates = document.xpath("//article | //main | //*[@role='main']")
+    if candidates:
+        return max(candidates, key=lambda element: len(element.text_content()))
+    scores = {}
+    for paragraph in document.iter("p"):
+        length = len(paragraph.text_content().strip())
+        parent = paragraph.getparent()
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0) + length
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + length / 2
+    if scores:
+        return max(scores, key=scores.get)
+    body = document.find("body")
+    return body if body is not None else document
+
+
+def extract_main_text(html: bytes, encoding: Optional[str] = None) -> Tuple[str, List[str]]:
+    """Parses (possibly truncated) HTML and returns the page title and the text blocks of its main content."""
+    document = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding=encoding, remove_comments=True))
+    title = " ".join((document.findtext(".//title") or "").split())
+
+    noise = [element for element in document.iter(*DROP_TAGS)]
+    noise += [
+        element for element in document.iter()
+        if element.tag not in ("html", "body") and isinstance(element.tag, str)
+        and BOILERPLATE.search(f"{element.get('class', '')} {element.get('id', '')}")
+        and not element.xpath(".//article | .//main")
+    ]
+    for element in noise:
+        if element.getparent() is not None:
+            element.drop_tree()
+
+    blocks = []
+    for element in _main_container(document).iter(*BLOCK_TAGS):
+        if next(element.iterdescendants(*BLOCK_TAGS), None) is not None:
+            continue
+        text = " ".join(element.text_content().split())
+        if len(text) >= 25 or (text and element.tag.startswith("h")):
+            blocks.append(text)
+    return title, blocks
+
+
+class WebPageExtractor:
+    """
+    Fetches a page with byte and time caps, extracts its main content, and keeps only the chunks
+    most relevant to a query (BM25) under a token budget, in page order.
+
+    Pass an `httpx.Client` / `httpx.AsyncClient` to reuse connections or to point the extractor at a
+    local stand-in server. The async path parses in the tool process pool when one is configured.
+    """
+
+    def __init__(self, client : httpx.Client = None, max_bytes: int = 2_000_000, timeout: float = 10.0,
+                 token_budget: int = 1200, chunk_tokens: int = 160, token_counter : LlamaTokenCounter = None,
+                 async_client : httpx.AsyncClient = None, read_timeout: float = None):
+        self._client = client
+        self._async_client = async_client
+        self._client_lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.read_timeout = read_timeout or timeout / 4
+        self.token_budget = token_budget
+        self.chunk_tokens = chunk_tokens
+        self.token_counter = token_counter or get_token_counter()
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(follow_redirects=True, headers={"User-Agent": USER_AGENT})
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(follow_redirects=True, headers={"User-Agent": USER_AGENT})
+        return self._async_client
+
+    def _check_content_type(self, response : httpx.Response) -> str:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "text/html").split(";")[0].strip().lower()
+        if content_type not in TEXT_CONTENT_TYPES:
+            raise WebFetchError(f"unsupported content type '{content_type}'")
+        return content_type
+
+    def _is_full(self, body: bytearray, deadline: float) -> bool:
+        if len(body) >= self.max_bytes:
+            metrics.incr("web_url.truncated_by_size")
+            return True
+        if time.monotonic() >= deadline:
+            metrics.incr("web_url.truncated_by_time")
+            return True
+        return False
+
+    def fetch(self, url: str) -> Tuple[bytes, str, Optional[str]]:
+        """
+        Streams at most `max_bytes` of the body within about `timeout` seconds. Returns `(body, content
+        type, charset)`. Each read times out after `read_timeout`, so a stalled read overshoots the cap by
+        at most that much; a body cut short by time is returned as far as it got.
+        """
+        deadline = time.monotonic() + self.timeout
+        body = bytearray()
+        with self.client.stream("GET", url, timeout=httpx.Timeout(self.timeout, read=self.read_timeout)) as response:
+            content_type = self._check_content_type(response)
+            try:
+                for chunk in response.iter_bytes():
+                    body.extend(chunk)
+                    if self._is_full(body, deadline):
+                        break
+            except httpx.ReadTimeout:
+                if not body:
+                    raise
+                metrics.incr("web_url.truncated_by_time")
+            charset = response.charset_encoding
+        metrics.observe("web_url.bytes", min(len(body), self.max_bytes))
+        return bytes(body[:self.max_bytes]), content_type, charset
+
+    async def afetch(self, url: str) -> Tuple[bytes, str, Optional[str]]:
+        """Like `fetch`, but `timeout` caps the whole request, including a stalled read."""
+        body = bytearray()
+        content_type = charset = None
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self.async_client.stream("GET", url, timeout=self.timeout) as response:
+                    content_type = self._check_content_type(response)
+                    charset = response.charset_encoding
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) >= self.max_bytes:
+                            metrics.incr("web_url.truncated_by_size")
+                            break
+        except TimeoutError:
+            if not body:
+                raise WebFetchTimeout(f"no content within {self.timeout:g} seconds") from None
+            metrics.incr("web_url.truncated_by_time")
+        metrics.observe("web_url.bytes", min(len(body), self.max_bytes))
+        return bytes(body[:self.max_bytes]), content_type, charset
+
+    def chunk(self, blocks: List[str]) -> List[str]:
+        """Packs consecutive blocks into chunks of about `chunk_tokens`, splitting oversized blocks at sentences."""
+        pieces = []
+        for block in blocks:
+            if self.token_counter.count_text(block) > self.chunk_tokens:
+                pieces.extend(split_sentences_lossless(block) or [block])
+            else:
+                pieces.append(block)
+        chunks, current, used = [], [], 0
+        for piece in pieces:
+            tokens = self.token_counter.count_text(piece)
+            if current and used + tokens > self.chunk_tokens:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def _blocks(self, body: bytes, content_type: str, charset: Optional[str]) -> Tuple[str, List[str]]:
+        if content_type == "text/plain":
+            return "", [block for block in body.decode(charset or "utf-8", errors="replace").split("\n\n") if block.strip()]
+        return extract_main_text(body, charset)
+
+    def _select(self, blocks: List[str], query: str) -> List[str]:
+        chunks = self.chunk(blocks)
+        scores = BM25(chunks).scores(query) if query else [0.0] * len(chunks)
+        kept = [chunks[i] for i in select_within_budget(chunks, scores, self.token_budget, self.token_counter.count_text)]
+        metrics.incr("web_url.chunks", len(chunks))
+        metrics.incr("web_url.chunks_kept", len(kept))
+        return kept
+
+    def extract(self, url: str, query: str = "") -> Tuple[str, List[str]]:
+        """The page title and its most relevant chunks; without a query the leading chunks are kept."""
+        started = time.perf_counter()
+        title, blocks = self._blocks(*self.fetch(url))
+        kept = self._select(blocks, query)
+        metrics.observe("web_url.extract_seconds", time.perf_counter() - started)
+        return title, kept
+
+    async def aextract(self, url: str, query: str = "") -> Tuple[str, List[str]]:
+        started = time.perf_counter()
+        body, content_type, charset = await self.afetch(url)
+        loop = asyncio.get_running_loop()
+        process_pool = get_process_pool()
+        if process_pool is not None and content_type != "text/plain":
+            title, blocks = await loop.run_in_executor(process_pool, extract_main_text, body, charset)
+        else:
+            title, blocks = await loop.run_in_executor(tool_executor, self._blocks, body, content_type, charset)
+        kept = await loop.run_in_executor(tool_executor, self._select, blocks, query)
+        metrics.observe("web_url.extract_seconds", time.perf_counter() - started)
+        return title, kept
+
+
+web_extractor = WebPageExtractor(
+    max_bytes=int(os.getenv('WEB_URL_MAX_BYTES', 2_000_000)),
+    timeout=float(os.getenv('WEB_URL_TIMEOUT', 10)),
+    token_budget=int(os.getenv('WEB_URL_TOKEN_BUDGET', 1200)),
+)
@@ -0,0 +1,70 @@
+import unittest
+from workflow_graphs.proxion.cache import (
+    CachedFailureResult, CachedResult, CachedToolFailure, ToolResultCache, TransientResult, cached_tool,
+)
+
+
+class CachedToolTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = ToolResultCache()
+        self.calls = 0
+
+    def tool(self, outcome, **kwargs):
+        @cached_tool("Test", ttl=60, cache=self.cache, **kwargs)
+        def run(query):
+            self.calls += 1
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return run
+
+    def test_hits_are_marked_as_cached(self):
+        run = self.tool("result")
+        self.assertNotIsInstance(run("q"), CachedResult)
+        self.assertEqual(run("  Q "), "result")
+        self.assertIsInstance(run("q"), CachedResult)
+        self.assertEqual(self.calls, 1)
+
+    def test_failure_results_come_back_as_cached_failures(self):
+        run = self.tool("nothing found", is_failure=lambda result: result == "nothing found")
+        run("q")
+        hit = run("q")
+        self.assertIsInstance(hit, CachedFailureResult)
+        self.assertEqual(hit, "nothing found")
+
+    def test_permanent_errors_are_negatively_cached(self):
+        run = self.tool(ValueError("bad query"))
+        with self.assertRaises(ValueError):
+            run("q")
+        with self.assertRaises(CachedToolFailure):
+            run("q")
+        self.assertEqual(self.calls, 1)
+
+    def test_transient_errors_and_results_are_not_cached(self):
+        for outcome in (TimeoutError("slow"), ConnectionError("reset"), TransientResult("rate limited")):
+            with self.subTest(outcome=outcome):
+                self.calls = 0
+                run = self.tool(outcome)
+                for _ in range(2):
+                    try:
+                        self.assertEqual(run("q"), "rate limited")
+                    except OSError:
+                        pass
+                self.assertEqual(self.calls, 2)
+
+    async def test_async_tools_share_the_behaviour(self):
+        calls = []
+
+        @cached_tool("Async", ttl=60, cache=self.cache)
+        async def run(query):
+            calls.append(query)
+            if len(calls) == 1:
+                raise TimeoutError("slow")
+            return "result"
+
+        with self.assertRaises(TimeoutError):
+            await run("q")
+        self.assertEqual(await run("q"), "result")
+        self.assertIsInstance(await run("q"), CachedResult)
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+from workflow_graphs.proxion.calculator import (
+    MAX_EXPRESSION_LENGTH, CalculatorError, FlatLambdaCDM, evaluate, format_result,
+)
+
+
+def reference_integral(integrand, z, points=200_000):
+    zs = np.linspace(0.0, z, points)
+    values = integrand(zs)
+    return float(np.sum((values[1:] + values[:-1]) * np.diff(zs) / 2))
+
+
+class FlatLambdaCDMTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cosmology = FlatLambdaCDM()
+
+    def test_comoving_distance_matches_direct_integration(self):
+        expected = self.cosmology.hubble_distance * reference_integral(lambda zs: 1.0 / self.cosmology.efunc(zs), 2.0)
+        self.assertAlmostEqual(float(self.cosmology.comoving_distance(2.0)), expected, delta=expected * 1e-5)
+
+    def test_lookback_time_matches_direct_integration(self):
+        expected = self.cosmology.hubble_time * reference_integral(lambda zs: 1.0 / ((1.0 + zs) * self.cosmology.efunc(zs)), 1.0)
+        self.assertAlmostEqual(float(self.cosmology.lookback_time(1.0)), expected, delta=expected * 1e-5)
+
+    def test_present_day_values(self):
+        self.assertAlmostEqual(float(self.cosmology.age(0)), 13.79, delta=0.01)
+        self.assertEqual(float(self.cosmology.comoving_distance(0)), 0.0)
+        self.assertAlmostEqual(float(self.cosmology.hubble(0)), self.cosmology.H0)
+
+    def test_age_plus_lookback_time_is_the_present_age(self):
+        z = np.array([0.1, 1.0, 10.0])
+        np.testing.assert_allclose(self.cosmology.age(z) + self.cosmology.lookback_time(z), self.cosmology.age(0), rtol=1e-4)
+
+    def test_distance_relations(self):
+        z = np.array([0.5, 1.0, 3.0])
+        comoving = self.cosmology.comoving_distance(z)
+        np.testing.assert_allclose(self.cosmology.luminosity_distance(z), (1 + z) * comoving)
+        np.testing.assert_allclose(self.cosmology.angular_diameter_distance(z), comoving / (1 + z))
+
+    def test_arrays_match_scalars(self):
+        z = [0.3, 2.0, 6.0]
+        np.testing.assert_allclose(self.cosmology.comoving_distance(z), [float(self.cosmology.comoving_distance(value)) for value in z], rtol=1e-5)
+
+    def test_rejects_negative_redshifts(self):
+        with self.assertRaises(CalculatorError):
+            self.cosmology.comoving_distance([1.0, -0.5])
+
+
+class EvaluateTests(unittest.TestCase):
+
+    def test_arithmetic_constants_and_units(self):
+        self.assertEqual(evaluate("2^10"), 1024)
+        self.assertAlmostEqual(float(evaluate("1 * pc / ly")), 3.2616, places=4)
+        self.assertAlmostEqual(float(evaluate("sqrt(16) + -2")), 2.0)
+
+    def test_cosmology_functions_take_parameters(self):
+        self.assertAlmostEqual(float(evaluate("hubble(0, H0=70)")), 70.0)
+        np.testing.assert_allclose(evaluate("age([0, 1])"), FlatLambdaCDM().age([0, 1]))
+
+    def test_huge_powers_overflow_instead_of_building_big_integers(self):
+        self.assertEqual(float(evaluate("10**10**10")), float("inf"))
+
+    def test_rejects_unsafe_syntax(self):
+        for expression in ("__import__('os')", "(1).__class__", "open('x')", "[x for x in (1, 2)]", "lambda: 1", "'text'", "True"):
+            with self.subTest(expression=expression), self.assertRaises(CalculatorError):
+                evaluate(expression)
+
+    def test_rejects_unknown_names_long_expressions_and_bad_input(self):
+        for expression in ("unknown + 1", "1 +", "1/0", "x" * (MAX_EXPRESSION_LENGTH + 1), "linspace(0, 1, 10**6)"):
+            with self.subTest(expression=expression[:20]), self.assertRaises(CalculatorError):
+                evaluate(expression)
+
+
+class FormatResultTests(unittest.TestCase):
+
+    def test_formats_scalars_and_arrays(self):
+        self.assertEqual(format_result(1 / 3), "0.333333")
+        self.assertEqual(format_result(np.array([1.0, 2.5])), "[1, 2.5]")
+
+    def test_appends_the_unit_of_a_bare_cosmology_call(self):
+        self.assertEqual(format_result(13.7915, "age(0)"), "age(0) = 13.7915 Gyr")
+        self.assertEqual(format_result(13791.5, "age(0) * 1000"), "age(0) * 1000 = 13791.5")
@@ -0,0 +1,93 @@
+import asyncio
+import itertools
+import unittest
+from workflow_graphs.proxion.hedging import HedgedLLM, get_node_stats
+
+_nodes = itertools.count()
+
+
+class ScriptedLLM:
+    """Answers the n-th call after `delays[n]` seconds, raising instead when the delay is an exception."""
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.calls = 0
+        self.cancelled = []
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        call = self.calls
+        self.calls += 1
+        outcome = self.delays[call]
+        try:
+            await asyncio.sleep(0 if isinstance(outcome, Exception) else outcome)
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return f"answer {call}"
+
+
+def hedged(llm, history=(), **kwargs) -> HedgedLLM:
+    """A HedgedLLM on a fresh node whose recent latencies are `history`."""
+    node = f"test-{next(_nodes)}"
+    for seconds in history:
+        get_node_stats(node).record(seconds)
+    return HedgedLLM(llm, node, min_samples=len(history) or 20, min_delay=0.01, **kwargs)
+
+
+class HedgedLLMTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_no_hedge_before_enough_samples(self):
+        llm = ScriptedLLM(0.05)
+        self.assertEqual(await hedged(llm).ainvoke("q"), "answer 0")
+        self.assertEqual(llm.calls, 1)
+
+    async def test_no_hedge_when_the_primary_beats_the_delay(self):
+        llm = ScriptedLLM(0.01, 0.01)
+        self.assertEqual(await hedged(llm, [0.05] * 5).ainvoke("q"), "answer 0")
+        self.assertEqual(llm.calls, 1)
+
+    async def test_slow_primary_is_hedged_and_the_loser_cancelled(self):
+        llm = ScriptedLLM(1.0, 0.01)
+        self.assertEqual(await hedged(llm, [0.02] * 5).ainvoke("q"), "answer 1")
+        self.assertEqual(llm.calls, 2)
+        await asyncio.sleep(0)
+        self.assertEqual(llm.cancelled, [0])
+
+    async def test_primary_can_still_win_after_the_hedge(self):
+        llm = ScriptedLLM(0.04, 1.0)
+        self.assertEqual(await hedged(llm, [0.02] * 5).ainvoke("q"), "answer 0")
+        await asyncio.sleep(0)
+        self.assertEqual(llm.cancelled, [1])
+
+    async def test_failed_hedge_falls_back_to_the_primary(self):
+        llm = ScriptedLLM(0.05, RuntimeError("hedge failed"))
+        self.assertEqual(await hedged(llm, [0.02] * 5).ainvoke("q"), "answer 0")
+
+    async def test_error_is_raised_when_every_request_fails(self):
+        llm = ScriptedLLM(RuntimeError("primary failed"))
+        with self.assertRaisesRegex(RuntimeError, "primary failed"):
+            await hedged(llm).ainvoke("q")
+
+    async def test_hedge_budget_caps_duplicates(self):
+        llm = ScriptedLLM(*[0.05, 0.01] * 4)
+        wrapper = hedged(llm, [0.02] * 5, max_hedge_ratio=0.0)
+        wrapper.stats.tokens = 1
+        await wrapper.ainvoke("q")
+        await wrapper.ainvoke("q")
+        self.assertEqual(llm.calls, 3)
+
+    async def test_records_only_primary_successes(self):
+        wrapper = hedged(ScriptedLLM(RuntimeError("failed"), 0.01))
+        with self.assertRaises(RuntimeError):
+            await wrapper.ainvoke("q")
+        self.assertEqual(len(wrapper.stats.latencies), 0)
+        await wrapper.ainvoke("q")
+        self.assertEqual(len(wrapper.stats.latencies), 1)
+
+    async def test_losing_primary_records_its_elapsed_time(self):
+        wrapper = hedged(ScriptedLLM(1.0, 0.01), [0.02] * 5)
+        await wrapper.ainvoke("q")
+        self.assertGreaterEqual(wrapper.stats.latencies[-1], 0.02)
+        self.assertLess(wrapper.stats.latencies[-1], 1.0)
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+import numpy as np
+from workflow_graphs.proxion import router
+from workflow_graphs.proxion.router import ToolRouter
+
+
+TOOLS = ["Calculator", "Wikipedia", "DuckDuckGo", "Web URL"]
+
+
+async def fake_embed_texts(texts):
+    return np.zeros((len(texts), 4), dtype="float32")
+
+
+async def fake_embed_query(text):
+    return np.zeros((1, 4), dtype="float32")
+
+
+class ExpressionTests(unittest.TestCase):
+
+    def assertExpressions(self, query, expected):
+        self.assertEqual(ToolRouter._expressions(query), expected, query)
+
+    def test_ignores_ranges_and_ratios_in_prose(self):
+        self.assertExpressions("The universe is 13-14 billion years old", [])
+        self.assertExpressions("Stars of 8-20 solar masses end as black holes", [])
+        self.assertExpressions("Even calculate it for 8 - 20 solar masses", [])
+        self.assertExpressions("It happened 24/12 or so", [])
+        self.assertExpressions("Observations from 2020-2024", [])
+
+    def test_accepts_cued_arithmetic(self):
+        self.assertExpressions("what is 24/12", ["24/12"])
+        self.assertExpressions("Calculate 3*4+2 for me", ["3*4+2"])
+        self.assertExpressions("2^10 = ?", ["2**10"])
+        self.assertExpressions("what's (3+4)*2", ["(3+4)*2"])
+
+    def test_accepts_spaced_operators(self):
+        self.assertExpressions("3 * 4 + 2", ["3 * 4 + 2"])
+        self.assertExpressions("1e-5 * 2", ["1e-5 * 2"])
+
+
+class SectionLookupTests(unittest.IsolatedAsyncioTestCase):
+
+    async def aroute(self, query, sections):
+        with mock.patch.object(router, "aembed_texts", fake_embed_texts), mock.patch.object(router, "aembed_query", fake_embed_query):
+            ToolRouter._prototype_vectors = None
+            try:
+                return await ToolRouter(TOOLS).aroute(query, sections)
+            finally:
+                ToolRouter._prototype_vectors = None
+
+    def test_topic_keeps_content_words(self):
+        self.assertEqual(ToolRouter._topic("Can you explain how black holes form?"), "black holes form")
+
+    async def test_qualifies_section_titles_with_the_topic(self):
+        calls = await self.aroute("How do black holes form?", ["Formation", "Event Horizon"])
+        self.assertEqual([call["args"]["query"] for call in calls], ["black holes form Formation", "black holes form Event Horizon"])
+
+    async def test_skips_perspective_and_generic_sections(self):
+        calls = await self.aroute("How do black holes form?", ["Overview", "Formation", "Scientific View", "Proxion View", "Philosophical Implications"])
+        self.assertEqual([call["args"]["query"] for call in calls], ["black holes form Formation"])
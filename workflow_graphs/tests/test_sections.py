@@ -0,0 +1,79 @@
+import unittest
+from workflow_graphs.proxion.sections import assemble_sections, join_sections, normalize_title, splice_sections, split_sections, strip_heading
+
+
+ANSWER = """# Dark Energy
+
+A short introduction.
+
+## Overview
+
+Dark energy drives the accelerating expansion.
+
+```markdown
+## Not a heading
+```
+
+## Evidence
+
+Type Ia supernovae.
+
+### Baryon acoustic oscillations
+
+A standard ruler.
+
+## Overview
+
+A second section with a repeated heading."""
+
+
+class SplitSectionsTests(unittest.TestCase):
+
+    def test_splits_at_top_level_headings_below_a_lone_title(self):
+        preamble, sections = split_sections(ANSWER)
+        self.assertEqual(preamble.strip(), "# Dark Energy\n\nA short introduction.")
+        self.assertEqual([section["title"] for section in sections], ["Overview", "Evidence", "Overview"])
+
+    def test_ignores_headings_inside_code_fences(self):
+        _, sections = split_sections(ANSWER)
+        self.assertIn("## Not a heading", sections[0]["body"])
+
+    def test_keeps_subsections_in_their_parent(self):
+        _, sections = split_sections(ANSWER)
+        self.assertIn("### Baryon acoustic oscillations", sections[1]["body"])
+
+    def test_markdown_without_headings_is_all_preamble(self):
+        self.assertEqual(split_sections("Just a paragraph."), ("Just a paragraph.", []))
+
+    def test_join_round_trips(self):
+        self.assertEqual(join_sections(*split_sections(ANSWER)), ANSWER)
+
+
+class SpliceSectionsTests(unittest.TestCase):
+
+    def test_replaces_only_the_given_indexes(self):
+        spliced = splice_sections(ANSWER, {1: "Cosmic microwave background."})
+        _, sections = split_sections(spliced)
+        self.assertEqual(sections[1]["body"], "Cosmic microwave background.")
+        self.assertEqual(sections[0]["body"], split_sections(ANSWER)[1][0]["body"])
+        self.assertTrue(spliced.startswith("# Dark Energy\n\nA short introduction."))
+
+    def test_repeated_headings_keep_their_own_rewrites(self):
+        _, sections = split_sections(splice_sections(ANSWER, {0: "First.", 2: "Second."}))
+        self.assertEqual([section["body"] for section in sections], ["First.", "Type Ia supernovae.\n\n### Baryon acoustic oscillations\n\nA standard ruler.", "Second."])
+
+    def test_without_rewrites_returns_the_answer_unchanged(self):
+        self.assertEqual(splice_sections(ANSWER, {}), ANSWER)
+
+
+class SectionHelpersTests(unittest.TestCase):
+
+    def test_normalize_title_ignores_markup_and_case(self):
+        self.assertEqual(normalize_title("**Key  Findings:**"), "key findings")
+
+    def test_strip_heading_drops_only_the_matching_heading(self):
+        self.assertEqual(strip_heading("## Overview\n\nBody.", "overview"), "Body.")
+        self.assertEqual(strip_heading("## Other\n\nBody.", "Overview"), "## Other\n\nBody.")
+
+    def test_assemble_sections_skips_empty_bodies(self):
+        self.assertEqual(assemble_sections([("A", "One."), ("B", "  "), ("C", "Three.")]), "## A\n\nOne.\n\n## C\n\nThree.")
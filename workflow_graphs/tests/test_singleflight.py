@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+from workflow_graphs.proxion.singleflight import SingleFlight, single_flight_key
+
+
+class RecordingConsumer:
+    def __init__(self):
+        self.statuses = []
+
+    async def send_status(self, msg: str = ''):
+        self.statuses.append(msg)
+
+
+class SingleFlightKeyTests(unittest.TestCase):
+
+    def test_ignores_case_spacing_and_trailing_punctuation(self):
+        self.assertEqual(single_flight_key("What is  dark energy?", "Casual"), single_flight_key("what is dark energy", "casual"))
+
+    def test_separates_modes_and_queries(self):
+        self.assertNotEqual(single_flight_key("dark energy", "Casual"), single_flight_key("dark energy", "Research"))
+        self.assertNotEqual(single_flight_key("dark energy", "Casual"), single_flight_key("dark matter", "Casual"))
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.flights = SingleFlight(wait_timeout=1.0)
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def work(self, consumer):
+        self.calls += 1
+        await consumer.send_status("Searching...")
+        await self.release.wait()
+        return {"response": f"answer {self.calls}"}
+
+    async def test_concurrent_callers_share_one_run(self):
+        leader, follower = RecordingConsumer(), RecordingConsumer()
+        first = asyncio.create_task(self.flights.run("key", self.work, leader))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(self.flights.run("key", self.work, follower))
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await asyncio.gather(first, second), [{"response": "answer 1"}] * 2)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(leader.statuses, ["Searching..."])
+        self.assertEqual(follower.statuses, ["Searching..."])
+
+    async def test_followers_receive_statuses_sent_after_they_join(self):
+        async def work(consumer):
+            await self.release.wait()
+            await consumer.send_status("Writing...")
+            return {"response": "done"}
+
+        follower = RecordingConsumer()
+        first = asyncio.create_task(self.flights.run("key", work, RecordingConsumer()))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(self.flights.run("key", work, follower))
+        await asyncio.sleep(0)
+        self.release.set()
+        await asyncio.gather(first, second)
+        self.assertEqual(follower.statuses, ["Writing..."])
+
+    async def test_different_keys_run_separately(self):
+        first = asyncio.create_task(self.flights.run("a", self.work, RecordingConsumer()))
+        second = asyncio.create_task(self.flights.run("b", self.work, RecordingConsumer()))
+        await asyncio.sleep(0)
+        self.release.set()
+        await asyncio.gather(first, second)
+        self.assertEqual(self.calls, 2)
+
+    async def test_follower_runs_the_work_itself_when_the_leader_fails(self):
+        async def failing(consumer):
+            await self.release.wait()
+            raise RuntimeError("leader failed")
+
+        first = asyncio.create_task(self.flights.run("key", failing, RecordingConsumer()))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(self.flights.run("key", self.work, RecordingConsumer()))
+        await asyncio.sleep(0)
+        self.release.set()
+        with self.assertRaises(RuntimeError):
+            await first
+        self.assertEqual(await second, {"response": "answer 1"})
+        self.assertEqual(self.calls, 1)
+
+    async def test_follower_stops_waiting_after_the_timeout(self):
+        self.flights.wait_timeout = 0.05
+        stuck = asyncio.Event()
+
+        async def hung(consumer):
+            await stuck.wait()
+            return {"response": "late"}
+
+        first = asyncio.create_task(self.flights.run("key", hung, RecordingConsumer()))
+        await asyncio.sleep(0)
+        self.release.set()
+        self.assertEqual(await self.flights.run("key", self.work, RecordingConsumer()), {"response": "answer 1"})
+        stuck.set()
+        self.assertEqual(await first, {"response": "late"})
+
+    async def test_later_calls_start_a_new_flight(self):
+        self.release.set()
+        await self.flights.run("key", self.work, RecordingConsumer())
+        await self.flights.run("key", self.work, RecordingConsumer())
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.flights._flights, {})
@@ -0,0 +1,106 @@
+import json
+import unittest
+from typing import List
+from pydantic import BaseModel
+from workflow_graphs.proxion.structured import IncrementalJSONParser, StructuredOutputError, parse_structured, repair_json
+
+
+class Verdict(BaseModel):
+    is_satisfactory: bool
+    feedback: str = ""
+
+
+class Points(BaseModel):
+    points: List[str]
+
+
+class RepairJSONTests(unittest.TestCase):
+
+    def assertRepairs(self, raw, expected):
+        self.assertEqual(json.loads(repair_json(raw)), expected)
+
+    def test_strips_fences_and_surrounding_prose(self):
+        self.assertRepairs('```json\n{"a": 1}\n```', {"a": 1})
+        self.assertRepairs('Sure! Here it is: {"a": 1} Hope that helps.', {"a": 1})
+
+    def test_converts_single_quotes_and_python_literals(self):
+        self.assertRepairs("{'a': 'x', 'b': True, 'c': None}", {"a": "x", "b": True, "c": None})
+        self.assertRepairs("{'text': \"it's\"}", {"text": "it's"})
+        self.assertRepairs("{'response': 'It\\'s ok'}", {"response": "It's ok"})
+
+    def test_drops_trailing_commas(self):
+        self.assertRepairs('{"a": [1, 2,],}', {"a": [1, 2]})
+        self.assertRepairs('[{"a": 1}, {"a": 2},]', [{"a": 1}, {"a": 2}])
+
+    def test_escapes_raw_control_characters_in_strings(self):
+        self.assertRepairs('{"a": "line\nbreak\tand tab"}', {"a": "line\nbreak\tand tab"})
+
+    def test_closes_truncated_objects(self):
+        self.assertRepairs('{"a": "cut off', {"a": "cut off"})
+        self.assertRepairs('{"a": {"b": [1, 2,', {"a": {"b": [1, 2]}})
+        self.assertRepairs('{"a": 1, "b":', {"a": 1})
+        self.assertRepairs('{"a": "x", "b": {"c": 1, "d', {"a": "x", "b": {"c": 1}})
+
+    def test_keeps_numbers_with_exponents(self):
+        self.assertRepairs('{"a": 1.5e3}', {"a": 1500.0})
+
+
+class ParseStructuredTests(unittest.TestCase):
+
+    def test_clean_json_is_not_marked_repaired(self):
+        self.assertEqual(parse_structured('{"is_satisfactory": true}', Verdict), (Verdict(is_satisfactory=True), False))
+
+    def test_repaired_json_is_marked_repaired(self):
+        parsed, repaired = parse_structured("```json\n{'is_satisfactory': False, 'feedback': 'more detail',}\n```", Verdict)
+        self.assertEqual(parsed, Verdict(is_satisfactory=False, feedback="more detail"))
+        self.assertTrue(repaired)
+
+    def test_unwraps_a_single_key_envelope(self):
+        self.assertEqual(parse_structured('{"result": {"is_satisfactory": true}}', Verdict)[0], Verdict(is_satisfactory=True))
+
+    def test_wraps_a_bare_list_into_the_only_list_field(self):
+        self.assertEqual(parse_structured('["a", "b"]', Points)[0], Points(points=["a", "b"]))
+
+    def test_raises_when_nothing_can_be_salvaged(self):
+        with self.assertRaises(StructuredOutputError):
+            parse_structured("no json here", Verdict)
+        with self.assertRaises(StructuredOutputError):
+            parse_structured('{"feedback": "missing the required field"}', Verdict)
+
+
+class IncrementalJSONParserTests(unittest.TestCase):
+
+    def feed_all(self, parser, chunks):
+        return [parser.feed(chunk) for chunk in chunks]
+
+    def test_reports_each_field_when_its_text_completes(self):
+        parser = IncrementalJSONParser()
+        finished = self.feed_all(parser, ['```json\n{"is_satisf', 'actory": tr', 'ue, "score": 0.8', ', "feedback": "ok"', '}\n```'])
+        self.assertEqual(finished, [{}, {}, {"is_satisfactory": True}, {"score": 0.8, "feedback": "ok"}, {}])
+        self.assertEqual(parser.fields, {"is_satisfactory": True, "score": 0.8, "feedback": "ok"})
+        self.assertTrue(parser.is_complete)
+
+    def test_scalars_complete_at_the_closing_brace(self):
+        parser = IncrementalJSONParser()
+        self.assertEqual(parser.feed('{"a": 1'), {})
+        self.assertEqual(parser.feed("}"), {"a": 1})
+        self.assertTrue(parser.is_complete)
+
+    def test_character_by_character_feed_matches_a_single_feed(self):
+        text = '{"a": "x, y", "b": [1, {"c": "}"}], "d": "say \\"hi\\"", "e": null}'
+        parser = IncrementalJSONParser()
+        self.feed_all(parser, text)
+        self.assertEqual(parser.fields, json.loads(text))
+
+    def test_accepts_python_literals(self):
+        self.assertEqual(IncrementalJSONParser().feed('{"a": True, "b": None}'), {"a": True, "b": None})
+
+    def test_skips_fields_it_cannot_parse(self):
+        parser = IncrementalJSONParser()
+        self.assertEqual(parser.feed('{"a": oops, "b": 2}'), {"b": 2})
+        self.assertNotIn("a", parser.fields)
+
+    def test_ignores_text_after_the_object(self):
+        parser = IncrementalJSONParser()
+        parser.feed('{"a": 1} {"b": 2}')
+        self.assertEqual(parser.fields, {"a": 1})
@@ -0,0 +1,161 @@
+import time
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.tools import StructuredTool
+from workflow_graphs.proxion.cache import CachedFailureResult, CachedResult, CachedToolFailure
+from workflow_graphs.proxion.tool_runtime import ToolRunner
+from workflow_graphs.proxion.tools import CircuitBreaker, CircuitOpenError, circuit_breakers
+
+
+async def succeed(value="ok"):
+    return value
+
+
+async def fail():
+    raise RuntimeError("upstream down")
+
+
+async def time_out():
+    raise asyncio.TimeoutError()
+
+
+async def cached_failure():
+    raise CachedToolFailure("remembered")
+
+
+class CircuitBreakerTests(unittest.IsolatedAsyncioTestCase):
+
+    async def trip(self, breaker, failures=None):
+        for _ in range(failures or breaker.failure_threshold):
+            with self.assertRaises(RuntimeError):
+                await breaker.acall(fail)
+
+    async def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+        await self.trip(breaker, 2)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        await self.trip(breaker, 1)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.is_available())
+        with self.assertRaises(CircuitOpenError):
+            await breaker.acall(succeed)
+
+    async def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+        await self.trip(breaker, 1)
+        self.assertEqual(await breaker.acall(succeed), "ok")
+        await self.trip(breaker, 1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    async def test_failure_results_and_timeouts_count_as_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60, is_failure=lambda result: result == "rate limited")
+        self.assertEqual(await breaker.acall(succeed, "rate limited"), "rate limited")
+        with self.assertRaises(asyncio.TimeoutError):
+            await breaker.acall(time_out)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    async def test_half_open_trial_closes_on_success(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        await self.trip(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(await breaker.acall(succeed), "ok")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertIsNone(breaker.opened_at)
+
+    async def test_half_open_trial_reopens_on_failure(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+        await self.trip(breaker)
+        breaker.opened_at -= 60
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        await self.trip(breaker, 1)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    async def test_admits_a_single_half_open_trial(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        await self.trip(breaker)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "ok"
+
+        trial = asyncio.create_task(breaker.acall(slow))
+        await asyncio.sleep(0)
+        self.assertTrue(breaker.trial_in_flight)
+        self.assertFalse(breaker.is_available())
+        with self.assertRaises(CircuitOpenError):
+            await breaker.acall(succeed)
+        release.set()
+        self.assertEqual(await trial, "ok")
+        self.assertTrue(breaker.is_available())
+
+    async def test_cached_failures_do_not_count(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+        with self.assertRaises(CachedToolFailure):
+            await breaker.acall(cached_failure)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.failures, 0)
+
+    async def test_cached_failure_during_the_trial_frees_the_trial(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        await self.trip(breaker)
+        with self.assertRaises(CachedToolFailure):
+            await breaker.acall(cached_failure)
+        self.assertFalse(breaker.trial_in_flight)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    async def test_cache_hits_are_not_counted(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60, is_failure=lambda result: result == "failed")
+        for _ in range(3):
+            await breaker.acall(succeed, CachedFailureResult("failed"))
+        self.assertEqual(breaker.failures, 0)
+        await self.trip(breaker, 1)
+        await breaker.acall(succeed, CachedResult("ok"))
+        self.assertEqual(breaker.failures, 1)
+
+    async def test_cache_hit_during_the_trial_frees_the_trial(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        await self.trip(breaker)
+        await breaker.acall(succeed, CachedResult("ok"))
+        self.assertFalse(breaker.trial_in_flight)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_empty_wikipedia_results_are_not_failures(self):
+        self.assertIsNone(circuit_breakers["Wikipedia"].is_failure)
+
+
+def sleeping_tool(name: str) -> StructuredTool:
+    def sleep(seconds: float) -> str:
+        """Sleeps for `seconds`."""
+        time.sleep(seconds)
+        return f"slept {seconds}"
+    return StructuredTool.from_function(sleep, name=name)
+
+
+class ToolRunnerTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.runner = ToolRunner(limits={"Slow": 1}, executor=self.executor)
+        self.tool = sleeping_tool("Slow")
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    async def test_runs_sync_tools_in_the_pool(self):
+        self.assertEqual(await self.runner.run(self.tool, {"seconds": 0}), "slept 0.0")
+
+    async def test_timeout_excludes_the_wait_for_a_slot(self):
+        first = asyncio.create_task(self.runner.run(self.tool, {"seconds": 0.2}))
+        await asyncio.sleep(0.05)
+        self.assertEqual(await self.runner.run(self.tool, {"seconds": 0}, timeout=0.1), "slept 0.0")
+        await first
+
+    async def test_timed_out_thread_keeps_its_slot_until_it_returns(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.runner.run(self.tool, {"seconds": 0.3}, timeout=0.05)
+        semaphore = self.runner._semaphore("Slow")
+        self.assertTrue(semaphore.locked())
+        await asyncio.sleep(0.4)
+        self.assertFalse(semaphore.locked())
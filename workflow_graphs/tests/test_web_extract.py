@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+import httpx
+from workflow_graphs.proxion.web_extract import WebFetchError, WebPageExtractor, extract_main_text
+
+
+PAGE = b"""<html><head><title>Dark Energy</title></head><body>
+<nav><p>Home | Missions | Contact us for more information</p></nav>
+<article>
+<h1>Dark energy</h1>
+<p>Dark energy is the unknown form of energy that drives the accelerating expansion of the universe.</p>
+<p>Type Ia supernovae observed in 1998 showed that distant galaxies are receding faster than expected.</p>
+<div class="share-buttons"><p>Share this article with your friends on social media today</p></div>
+</article>
+<footer><p>Copyright 2026, all rights reserved by the publisher of this page</p></footer>
+</body></html>"""
+
+
+class WordCounter:
+    def count_text(self, text: str) -> int:
+        return len(text.split())
+
+
+def extractor(handler, **kwargs) -> WebPageExtractor:
+    transport = httpx.MockTransport(handler)
+    return WebPageExtractor(
+        client=httpx.Client(transport=transport),
+        async_client=httpx.AsyncClient(transport=transport),
+        token_counter=WordCounter(),
+        **kwargs,
+    )
+
+
+def html(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, headers={"content-type": "text/html; charset=utf-8"}, content=PAGE)
+
+
+class ExtractMainTextTests(unittest.TestCase):
+
+    def test_keeps_article_blocks_and_drops_boilerplate(self):
+        title, blocks = extract_main_text(PAGE)
+        self.assertEqual(title, "Dark Energy")
+        self.assertEqual(blocks[0], "Dark energy")
+        self.assertTrue(any("accelerating expansion" in block for block in blocks))
+        self.assertFalse(any("Share this article" in block or "Copyright" in block or "Missions" in block for block in blocks))
+
+
+class WebPageExtractorTests(unittest.TestCase):
+
+    def test_extract_ranks_chunks_by_query(self):
+        title, chunks = extractor(html, token_budget=20, chunk_tokens=20).extract("https://example.org/dark-energy", "supernovae 1998")
+        self.assertEqual(title, "Dark Energy")
+        self.assertEqual(len(chunks), 1)
+        self.assertIn("supernovae", chunks[0])
+
+    def test_body_is_capped_at_max_bytes(self):
+        body, _, _ = extractor(html, max_bytes=100).fetch("https://example.org/")
+        self.assertEqual(len(body), 100)
+
+    def test_binary_content_is_rejected(self):
+        def pdf(request):
+            return httpx.Response(200, headers={"content-type": "application/pdf"}, content=b"%PDF-1.7")
+        with self.assertRaises(WebFetchError):
+            extractor(pdf).fetch("https://example.org/paper.pdf")
+
+    def test_http_errors_propagate(self):
+        def missing(request):
+            return httpx.Response(404)
+        with self.assertRaises(httpx.HTTPStatusError):
+            extractor(missing).fetch("https://example.org/missing")
+
+
+class AsyncWebPageExtractorTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_aextract_matches_extract(self):
+        web = extractor(html, token_budget=200)
+        self.assertEqual(await web.aextract("https://example.org/", "dark energy"), web.extract("https://example.org/", "dark energy"))
+
+    async def test_stalled_read_is_cut_at_the_time_cap(self):
+        async def stalling():
+            yield PAGE[:300]
+            await asyncio.sleep(30)
+            yield PAGE[300:]
+
+        def slow(request):
+            return httpx.Response(200, headers={"content-type": "text/html"}, content=stalling())
+
+        started = asyncio.get_running_loop().time()
+        body, _, _ = await extractor(slow, timeout=0.2).afetch("https://example.org/")
+        self.assertEqual(body, PAGE[:300])
+        self.assertLess(asyncio.get_running_loop().time() - started, 2)
+
+    async def test_stall_before_any_content_is_an_error(self):
+        async def silent():
+            await asyncio.sleep(30)
+            yield b""
+
+        def slow(request):
+            return httpx.Response(200, headers={"content-type": "text/html"}, content=silent())
+
+        with self.assertRaises(WebFetchError):
+            await extractor(slow, timeout=0.2).afetch("https://example.org/")